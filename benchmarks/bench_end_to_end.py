@@ -0,0 +1,112 @@
+"""
+端到端基准：把运行引擎指向本地 WHMCS 替身服务器，测量墙钟时间、CPU 和峰值 RSS。
+
+每个场景 (账号数 × 并发数 × 错误密码比例) 在独立子进程中运行。CPU 取自该子进程及其已回收的
+子进程（Playwright 驱动与 Chromium）的 rusage；峰值 RSS 由子进程在结束前自行上报，
+为它本身及其已回收子进程中最大单个进程的值（父进程的 RUSAGE_CHILDREN 是历次场景的累计最大值，不能按场景区分）。
+错误密码的账号走替身服务器的 "Invalid credentials" 失败路径（含失败截图 / HTML 的保存）。
+
+运行：python benchmarks/bench_end_to_end.py [--accounts 1 10 100] [--concurrency 1 4 8] [--bad-ratio 0 0.25]
+需要已安装 Playwright 和 Chromium，全程离线。
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from stand_in_server import PASSWORD, start_server  # noqa: E402
+
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def run_worker(args):
+    """子进程：环境变量已指向替身服务器，直接调用运行引擎"""
+    import asyncio
+
+    import login
+
+    login.apply_timing_profile(args.timing)
+    # 错误密码的账号均匀分布在账号列表中
+    ratio = args.worker_bad_ratio
+    accounts = [(f"user{i}@example.com", "wrong-" + PASSWORD if int((i + 1) * ratio) > int(i * ratio) else PASSWORD)
+                for i in range(args.worker_accounts)]
+    stats = {"launches": 0, "contexts": 0}
+    started = time.monotonic()
+    results = asyncio.run(login.run_accounts_async(accounts, args.worker_concurrency, stats, max_retries=0))
+    login.flush_artifacts()
+    elapsed = time.monotonic() - started
+    ok = sum(1 for _, error, _ in results if error is None)
+    # Linux 上 ru_maxrss 单位为 KB；asyncio.run 返回时 Playwright 驱动（及其下的 Chromium）已被回收
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    print(RESULT_PREFIX + json.dumps({"wall": elapsed, "ok": ok, "peak_rss_mb": peak_kb / 1024}), flush=True)
+
+
+def run_scenario(base_url: str, accounts: int, concurrency: int, bad_ratio: float, timing: str) -> dict:
+    """在独立子进程中运行一个场景，返回墙钟 / CPU / RSS"""
+    with tempfile.TemporaryDirectory() as state_dir:
+        env = dict(os.environ)
+        env.update({
+            "KEEPALIVE_TARGET_URL": f"{base_url}/index.php?rp=/login",
+            "KEEPALIVE_STATE_DIR": state_dir,
+            "KEEPALIVE_ARTIFACT_DIR": os.path.join(state_dir, "artifacts"),
+            "KEEPALIVE_TRACE_FILE": "",
+        })
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker",
+             "--worker-accounts", str(accounts), "--worker-concurrency", str(concurrency),
+             "--worker-bad-ratio", str(bad_ratio), "--timing", timing],
+            env=env, capture_output=True, text=True,
+        )
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    result_line = next((line for line in proc.stdout.splitlines() if line.startswith(RESULT_PREFIX)), None)
+    if proc.returncode != 0 or result_line is None:
+        raise RuntimeError(f"场景 {accounts}x{concurrency} (错误密码 {bad_ratio:.0%}) 失败:\n{proc.stdout[-2000:]}\n{proc.stderr[-2000:]}")
+    result = json.loads(result_line[len(RESULT_PREFIX):])
+    result["cpu"] = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--bad-ratio", type=float, nargs="+", default=[0.0, 0.25],
+                        help="使用错误密码的账号比例 (默认 0 和 0.25，后者覆盖登录失败路径)")
+    parser.add_argument("--timing", default="fast", help="时间配置档 (默认 fast，排除固定等待的干扰)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-accounts", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-concurrency", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-bad-ratio", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    server = start_server()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    print(f"替身服务器: {base_url}  时间配置: {args.timing}")
+    print(f"{'accounts':>8} {'conc':>5} {'bad':>5} {'ok':>5} {'wall':>9} {'wall/acct':>10} {'cpu/acct':>9} {'peak_rss':>10}")
+    try:
+        for accounts in args.accounts:
+            for concurrency in args.concurrency:
+                for bad_ratio in args.bad_ratio:
+                    r = run_scenario(base_url, accounts, concurrency, bad_ratio, args.timing)
+                    print(f"{accounts:>8} {concurrency:>5} {bad_ratio:>5.0%} {r['ok']:>5} {r['wall']:>8.2f}s "
+                          f"{r['wall'] / accounts:>9.3f}s {r['cpu'] / accounts:>8.3f}s {r['peak_rss_mb']:>8.0f}MB", flush=True)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
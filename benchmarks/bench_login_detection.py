@@ -0,0 +1,113 @@
+"""
+登录页检测延迟基准：表单出现 → 脚本检测到的耗时，旧轮询循环 vs 事件驱动检测。
+
+旧实现：每 3 秒 page.content() 复制整页 HTML，转小写后逐个扫描指标。
+新实现：login.async_wait_for_login_page()，在页面内用 wait_for_function 检测表单。
+
+运行：python benchmarks/bench_login_detection.py [--trials 10]
+需要已安装 Playwright 和 Chromium，不访问外网。
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import login  # noqa: E402
+from playwright.async_api import async_playwright  # noqa: E402
+
+# 旧版 login_account 中的指标列表与轮询间隔
+LEGACY_INDICATORS = [
+    "输入邮箱", "邮箱地址", "Email", "邮箱",
+    "登录用户中心", "登录", "登录到您的账户",
+    "placeholder=\"输入邮箱\"", "input[type=\"email\"]"
+]
+LEGACY_POLL_INTERVAL = 3
+
+# 先显示一个“加载中”页面，delay 毫秒后插入 WHMCS 风格的登录表单，并记录表单就绪时刻
+PAGE_TEMPLATE = """
+<html><head><title>Loading</title></head>
+<body><div id="app">Loading...</div>
+<script>
+setTimeout(() => {
+    document.getElementById('app').innerHTML =
+        '<form><input type="email" id="inputEmail" placeholder="输入邮箱">' +
+        '<input type="password" id="inputPassword"><button type="submit">登录</button></form>';
+    window.__formReadyAt = performance.now();
+}, %d);
+</script></body></html>
+"""
+
+
+async def legacy_detect(page, max_wait: float) -> bool:
+    """旧版轮询检测（仅保留到达登录页的判定部分）"""
+    start = time.time()
+    while time.time() - start < max_wait:
+        try:
+            html_lower = (await page.content()).lower()
+        except Exception:
+            html_lower = ""
+        if any(ind.lower() in html_lower for ind in LEGACY_INDICATORS):
+            return True
+        await asyncio.sleep(LEGACY_POLL_INTERVAL)
+    return False
+
+
+async def event_detect(page, max_wait: float) -> bool:
+    reached, _ = await login.async_wait_for_login_page(page, max_wait)
+    return reached
+
+
+async def measure(browser, detector, delay_ms: int) -> float:
+    """返回表单就绪到检测完成的毫秒数"""
+    context = await browser.new_context()
+    try:
+        page = await context.new_page()
+        await page.set_content(PAGE_TEMPLATE % delay_ms)
+        if not await detector(page, 30):
+            raise RuntimeError("未检测到登录表单")
+        return await page.evaluate("performance.now() - window.__formReadyAt")
+    finally:
+        await context.close()
+
+
+async def run_trials(delays: list) -> tuple:
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            legacy = [await measure(browser, legacy_detect, d) for d in delays]
+            event = [await measure(browser, event_detect, d) for d in delays]
+        finally:
+            await browser.close()
+    return legacy, event
+
+
+def summarize(name: str, samples: list):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{name:<8} n={len(samples):<3} mean={statistics.mean(samples):8.1f}ms "
+          f"p50={statistics.median(samples):8.1f}ms p95={p95:8.1f}ms max={samples[-1]:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    delays = [rng.randint(200, 4000) for _ in range(args.trials)]
+
+    legacy, event = asyncio.run(run_trials(delays))
+
+    print("表单就绪 → 检测完成 延迟")
+    summarize("legacy", legacy)
+    summarize("event", event)
+
+
+if __name__ == "__main__":
+    main()
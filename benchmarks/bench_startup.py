@@ -0,0 +1,85 @@
+"""
+冷启动基准：login.py 的导入耗时与占位符配置下的完整启动耗时。
+
+import：用 `python -X importtime -c "import login"` 取 login 模块的累计导入时间，
+并列出被连带导入的重量级依赖（playwright / requests / asyncio / multiprocessing）。
+eager：同样方式测量一次性导入这些依赖的耗时，作为全部在模块顶层导入时的参考。
+startup：在不设置 Telegram / 账号环境变量的情况下运行 `python login.py`，
+脚本检测到占位符后直接退出，测得的是从进程启动到退出的墙钟时间。
+
+运行：python benchmarks/bench_startup.py [--trials 10]
+不需要 Chromium，不访问外网。
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+HEAVY_MODULES = ["playwright", "requests", "asyncio", "multiprocessing"]
+EAGER_IMPORTS = "import playwright.sync_api, playwright.async_api, requests, asyncio, multiprocessing"
+
+# 占位符配置：main() 在解析账号之前就会返回
+PLACEHOLDER_ENV_KEYS = ["TELEGRAM_BOT_TOKEN", "TELEGRAM_CHAT_ID", "SITE_ACCOUNTS"]
+
+
+def importtime(code: str) -> tuple:
+    """运行一次 -X importtime，返回 (顶层模块名 → 累计微秒, 全部导入的模块名集合)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+    )
+    top_level = {}
+    modules = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line.split("|")
+        name = raw_name.rstrip()
+        modules.add(name.strip())
+        # 顶层模块（即 -c 中直接导入的）在 importtime 输出中缩进为 1 个空格
+        if len(name) - len(name.lstrip()) == 1:
+            top_level[name.strip()] = top_level.get(name.strip(), 0) + int(cumulative_us)
+    return top_level, modules
+
+
+def startup_seconds() -> float:
+    env = {k: v for k, v in os.environ.items() if k not in PLACEHOLDER_ENV_KEYS}
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "login.py"], cwd=ROOT_DIR, env=env, capture_output=True, check=True)
+    return time.perf_counter() - started
+
+
+def summarize(name: str, values: list, unit: str = "ms"):
+    print(f"  {name:<8} median {statistics.median(values):8.1f}{unit}  min {min(values):8.1f}{unit}  max {max(values):8.1f}{unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trials", type=int, default=10)
+    args = parser.parse_args()
+
+    login_ms = []
+    eager_ms = []
+    startup_ms = []
+    loaded = set()
+    for _ in range(args.trials):
+        top_level, modules = importtime("import login")
+        login_ms.append(top_level["login"] / 1000)
+        loaded |= {m for m in HEAVY_MODULES if m in modules}
+        top_level, _ = importtime(EAGER_IMPORTS)
+        eager_ms.append(sum(top_level.values()) / 1000)
+        startup_ms.append(startup_seconds() * 1000)
+
+    print("导入 / 启动耗时")
+    summarize("import", login_ms)
+    summarize("eager", eager_ms)
+    summarize("startup", startup_ms)
+    print(f"import login 连带导入的重量级依赖: {', '.join(sorted(loaded)) or '无'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+本地 WHMCS 风格替身服务器，供基准测试离线使用。
+
+- GET  /index.php?rp=/login   登录表单
+- POST /index.php?rp=/login   密码为 PASSWORD 时写入会话 Cookie 并跳转客户区，否则返回 "Invalid credentials" 错误页
+- GET  /clientarea.php        已登录时显示 "Time until suspension" 倒计时，未登录时重定向回登录页
+
+单独运行：python benchmarks/stand_in_server.py --port 8080
+"""
+import argparse
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+PASSWORD = "correct-horse"
+COUNTDOWN = "12d 3h 4m 5s"
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>登录 - FreeCloud</title></head>
+<body>
+<h1>登录到您的账户</h1>
+{error}
+<form method="post" action="/index.php?rp=/login">
+  <input type="email" id="inputEmail" name="username" placeholder="输入邮箱">
+  <input type="password" id="inputPassword" name="password" placeholder="密码">
+  <button type="submit" class="btn btn-primary">登录</button>
+</form>
+</body></html>
+"""
+
+ERROR_BLOCK = '<div class="alert alert-danger">Invalid credentials. 登录失败</div>'
+
+CLIENT_AREA_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Client Area - FreeCloud</title></head>
+<body>
+<h1>Client Area</h1>
+<div class="panel">My Services</div>
+<div class="countdown"><span>Time until suspension</span> <strong>{countdown}</strong></div>
+<a href="/logout.php">Logout</a>
+</body></html>
+"""
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    sessions: set = set()
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _session_valid(self) -> bool:
+        cookie = self.headers.get("Cookie") or ""
+        for part in cookie.split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "WHMCSsession":
+                with self.lock:
+                    return value in self.sessions
+        return False
+
+    def _send_html(self, body: str, status: int = 200, headers: dict | None = None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _redirect(self, location: str, headers: dict | None = None):
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        if self.path.startswith("/clientarea.php"):
+            if self._session_valid():
+                self._send_html(CLIENT_AREA_PAGE.format(countdown=COUNTDOWN))
+            else:
+                self._redirect("/index.php?rp=/login")
+        elif self.path.startswith("/index.php"):
+            self._send_html(LOGIN_PAGE.format(error=""))
+        elif self.path.startswith("/logout.php"):
+            self._redirect("/index.php?rp=/login")
+        else:
+            self._send_html("not found", status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        if form.get("password", [""])[0] == PASSWORD:
+            token = secrets.token_hex(16)
+            with self.lock:
+                self.sessions.add(token)
+            self._redirect("/clientarea.php", {"Set-Cookie": f"WHMCSsession={token}; Path=/; HttpOnly"})
+        else:
+            self._send_html(LOGIN_PAGE.format(error=ERROR_BLOCK))
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """在后台线程启动替身服务器，返回 server（server.server_port 为实际端口）"""
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 WHMCS 风格替身服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), StandInHandler)
+    print(f"登录页: http://{args.host}:{args.port}/index.php?rp=/login  (密码: {PASSWORD})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
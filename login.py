@@ -1,433 +1,2430 @@
+from __future__ import annotations
+
 import os
-import requests
+import json
+import argparse
+import heapq
+import gzip
+import hashlib
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
 import re
 from datetime import datetime
-from playwright.sync_api import sync_playwright, Page, Browser, BrowserContext, Playwright
+from urllib.parse import urljoin, urlsplit
+from typing import TYPE_CHECKING
+
+# playwright、requests、asyncio、multiprocessing 导入耗时较长，只在真正用到的函数内导入，
+# 占位符配置直接退出、全部账号被跳过等情况不必为它们付出启动时间（见 benchmarks/bench_startup.py）
+if TYPE_CHECKING:
+    import requests
+    from playwright.async_api import Page as AsyncPage, Browser as AsyncBrowser, BrowserContext as AsyncBrowserContext, Playwright as AsyncPlaywright
+
+# --- 1. 日志函数 (公共) ---
+def log(message: str):
+    """一个简单的日志打印函数"""
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+
+# --- 2. Telegram 通知函数 ---
+TELEGRAM_MAX_LENGTH = 4096
+TELEGRAM_MAX_ATTEMPTS = 4
+TELEGRAM_BACKOFF_BASE = 1.0
+TELEGRAM_TIMEOUT = (5, 15)  # (连接, 读取) 秒
+# 进度消息两次编辑之间的最小间隔（秒）；间隔内的多次更新合并为一次编辑
+TELEGRAM_EDIT_INTERVAL = 3.0
+# 运行开始时发送状态消息并随账号完成实时更新，结束时替换为最终报告；设为 0 只发送最终报告
+LIVE_PROGRESS = os.environ.get("KEEPALIVE_LIVE_PROGRESS", "1") != "0"
+
+# 复用同一个 Session（连接池）和同一个后台发送线程；单线程保证多条消息按顺序到达
+TELEGRAM_SESSION = None
+TELEGRAM_EXECUTOR = None
+
+
+def telegram_session() -> requests.Session:
+    global TELEGRAM_SESSION
+    if TELEGRAM_SESSION is None:
+        import requests
+        TELEGRAM_SESSION = requests.Session()
+    return TELEGRAM_SESSION
+
+
+def split_message(message: str, limit: int = TELEGRAM_MAX_LENGTH) -> list:
+    """
+    按行把消息切成不超过 limit 字符的若干段。
+    被切断的 ``` 代码块在段尾补上闭合、在下一段开头重新打开，保证每段 Markdown 都能单独解析。
+    """
+    fence = "```"
+    budget = limit - 2 * (len(fence) + 1)
+    chunks = []
+    current = []
+    size = 0
+    in_code = False
+    for line in message.split("\n"):
+        # 单行超长时硬切
+        pieces = [line[i:i + budget] for i in range(0, len(line), budget)] or [""]
+        for piece in pieces:
+            if current and size + len(piece) + 1 > budget:
+                chunks.append("\n".join(current + ([fence] if in_code else [])))
+                current = [fence] if in_code else []
+                size = sum(len(x) + 1 for x in current)
+            current.append(piece)
+            size += len(piece) + 1
+        if line.strip().startswith(fence):
+            in_code = not in_code
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def post_telegram(url: str, payload: dict, proxies: dict | None) -> dict | None:
+    """
+    调用一次 Bot API：429 时按 Telegram 返回的 retry_after 等待，网络错误和 5xx 指数退避重试，
+    其余 4xx（如 Markdown 解析失败）直接放弃。成功时返回 result（Message 对象），失败返回 None。
+    """
+    import requests
+
+    session = telegram_session()
+    for attempt in range(TELEGRAM_MAX_ATTEMPTS):
+        delay = TELEGRAM_BACKOFF_BASE * 2 ** attempt
+        try:
+            response = session.post(url, json=payload, timeout=TELEGRAM_TIMEOUT, proxies=proxies)
+            if response.status_code == 200:
+                return response.json().get("result") or {}
+            if response.status_code == 400 and "message is not modified" in response.text:
+                return {"message_id": payload.get("message_id")}
+            if response.status_code == 429:
+                try:
+                    delay = float(response.json().get("parameters", {}).get("retry_after", delay))
+                except ValueError:
+                    pass
+                log(f"⚠️ Telegram 限流，{delay:.0f}s 后重试")
+            elif response.status_code >= 500:
+                log(f"⚠️ Telegram 服务端错误 {response.status_code}，{delay:.0f}s 后重试")
+            else:
+                log(f"❌ Telegram 消息发送失败: {response.status_code} - {response.text}")
+                return None
+        except requests.RequestException as e:
+            log(f"⚠️ 发送 Telegram 消息时发生异常: {e}，{delay:.0f}s 后重试")
+        if attempt < TELEGRAM_MAX_ATTEMPTS - 1:
+            time.sleep(delay)
+    log(f"❌ Telegram 消息发送失败：已重试 {TELEGRAM_MAX_ATTEMPTS} 次")
+    return None
+
+
+def send_telegram_message(bot_token, chat_id, message, proxy_url: str | None = None) -> bool:
+    """使用 requests 向 Telegram Bot API 发送消息 (支持代理)，超过 4096 字符时按行拆成多条依次发送"""
+    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+
+    # --- 设置代理 ---
+    proxies = telegram_proxies(proxy_url)
+    if proxies:
+        log(f"ℹ️ 检测到 TELEGRAM_PROXY，将使用代理: {proxy_url}")
+    # --- 代理设置完毕 ---
+
+    chunks = split_message(message)
+    sent = 0
+    for chunk in chunks:
+        payload = {
+            'chat_id': chat_id,
+            'text': chunk,
+            'parse_mode': 'Markdown'
+        }
+        if post_telegram(url, payload, proxies) is not None:
+            sent += 1
+    if sent == len(chunks):
+        log(f"✅ Telegram 消息发送成功（共 {len(chunks)} 条）")
+    return sent == len(chunks)
+
+
+def telegram_proxies(proxy_url: str | None) -> dict | None:
+    return {'http': proxy_url, 'https': proxy_url} if proxy_url else None
+
+
+def submit_telegram(fn, *args):
+    """把一次 Telegram 调用排到后台发送线程上；返回 Future。进程退出前用 wait_for_telegram() 等待发送完成"""
+    global TELEGRAM_EXECUTOR
+    if TELEGRAM_EXECUTOR is None:
+        TELEGRAM_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="telegram")
+    return TELEGRAM_EXECUTOR.submit(fn, *args)
+
+
+def send_telegram_message_background(bot_token, chat_id, message, proxy_url: str | None = None):
+    """在后台线程发送，调用方不必等待网络"""
+    return submit_telegram(send_telegram_message, bot_token, chat_id, message, proxy_url)
+
+
+def start_progress(bot_token, chat_id, total: int, proxy_url: str | None = None) -> dict:
+    """
+    发送一条初始状态消息，之后由 update_progress 原地编辑（editMessageText）。
+    所有网络调用都排在后台发送线程上，与最终报告保持先后顺序。
+    """
+    progress = {
+        "api": f"https://api.telegram.org/bot{bot_token}",
+        "chat_id": chat_id,
+        "proxies": telegram_proxies(proxy_url),
+        "total": total,
+        "done": 0,
+        "ok": 0,
+        "skipped": 0,
+        "failures": [],
+        "message_id": None,
+        "last_text": None,
+        "last_edit": 0.0,
+        "pending": False,
+        "lock": threading.Lock(),
+    }
+
+    def send_initial():
+        text = progress_text(progress)
+        result = post_telegram(f"{progress['api']}/sendMessage",
+                               {'chat_id': chat_id, 'text': text, 'parse_mode': 'Markdown'}, progress["proxies"])
+        if result:
+            progress["message_id"] = result.get("message_id")
+            progress["last_text"] = text
+            progress["last_edit"] = time.monotonic()
+
+    submit_telegram(send_initial)
+    return progress
+
+
+def progress_text(progress: dict) -> str:
+    """状态消息正文：进度计数 + 已出现的失败（超长时截断到一条消息内）"""
+    with progress["lock"]:
+        lines = [
+            f"*FreeCloud 保活进行中* {progress['done']}/{progress['total']}",
+            f"成功: {progress['ok']}, 失败: {len(progress['failures'])}, 跳过: {progress['skipped']}",
+        ]
+        lines.extend(progress["failures"])
+    return split_message("\n".join(lines))[0]
+
+
+def edit_progress(progress: dict, text: str):
+    """编辑状态消息，并保证与上一次编辑之间至少间隔 TELEGRAM_EDIT_INTERVAL"""
+    wait = progress["last_edit"] + TELEGRAM_EDIT_INTERVAL - time.monotonic()
+    if wait > 0:
+        time.sleep(wait)
+    payload = {'chat_id': progress["chat_id"], 'message_id': progress["message_id"], 'text': text, 'parse_mode': 'Markdown'}
+    result = post_telegram(f"{progress['api']}/editMessageText", payload, progress["proxies"])
+    progress["last_edit"] = time.monotonic()
+    if result is not None:
+        progress["last_text"] = text
+    return result
+
+
+def update_progress(progress: dict | None, user: str, error, info: dict):
+    """
+    单个账号完成时调用（可能来自事件循环或其他线程）。
+    已有一次编辑在排队时只更新计数，由那次编辑带上最新内容，实现合并与限流。
+    """
+    if progress is None:
+        return
+    with progress["lock"]:
+        progress["done"] += 1
+        if info.get("path") == "skipped":
+            progress["skipped"] += 1
+        elif error is None:
+            progress["ok"] += 1
+        else:
+            progress["failures"].append(f"❌ `{user}` - {escape_markdown(str(error)[:200])}")
+        if progress["pending"]:
+            return
+        progress["pending"] = True
+
+    def flush():
+        with progress["lock"]:
+            progress["pending"] = False
+        text = progress_text(progress)
+        if progress["message_id"] and text != progress["last_text"]:
+            edit_progress(progress, text)
+
+    submit_telegram(flush)
+
+
+def finish_progress(progress: dict | None, bot_token, chat_id, final_report: str, proxy_url: str | None = None):
+    """用最终报告替换状态消息；报告超过一条消息时，其余部分作为新消息接在后面"""
+    if progress is None:
+        send_telegram_message_background(bot_token, chat_id, final_report, proxy_url)
+        return
+
+    def replace():
+        chunks = split_message(final_report)
+        if not progress["message_id"] or edit_progress(progress, chunks[0]) is None:
+            send_telegram_message(bot_token, chat_id, final_report, proxy_url)
+            return
+        if len(chunks) > 1:
+            send_telegram_message(bot_token, chat_id, "\n".join(chunks[1:]), proxy_url)
+        log("✅ Telegram 状态消息已替换为最终报告")
+
+    submit_telegram(replace)
+
+
+def wait_for_telegram():
+    """等待后台队列中的消息全部发送完毕"""
+    global TELEGRAM_EXECUTOR
+    if TELEGRAM_EXECUTOR is not None:
+        TELEGRAM_EXECUTOR.shutdown(wait=True)
+        TELEGRAM_EXECUTOR = None
+
+
+# --- 3. 登录页面特征 (登录引擎与 HTTP 快速校验共用) ---
+
+# 时间配置档：slow_mo 作用于整个共享浏览器，其余为各步骤之间的固定等待（秒）
+# default 与原先写死的数值一致；careful 更接近人类操作；fast 适合已验证稳定的站点
+TIMING_PROFILES = {
+    "careful": {
+        "slow_mo_ms": 800,
+        "pre_submit_pause": 2.0,
+        "post_submit_pause": 3.0,
+        "turnstile_pause": 2.0,
+        "poll_interval": 3.0,
+        "inter_account_delay": 8.0,
+        "retry_base": 15.0,
+        "retry_step": 5.0,
+    },
+    "default": {
+        "slow_mo_ms": 500,
+        "pre_submit_pause": 1.5,
+        "post_submit_pause": 2.5,
+        "turnstile_pause": 1.5,
+        "poll_interval": 3.0,
+        "inter_account_delay": 5.0,
+        "retry_base": 10.0,
+        "retry_step": 5.0,
+    },
+    "fast": {
+        "slow_mo_ms": 0,
+        "pre_submit_pause": 0.2,
+        "post_submit_pause": 0.5,
+        "turnstile_pause": 1.0,
+        "poll_interval": 1.0,
+        "inter_account_delay": 0.0,
+        "retry_base": 5.0,
+        "retry_step": 5.0,
+    },
+}
+
+# 当前生效的时间配置（由 KEEPALIVE_TIMING 或 --timing 选择）
+TIMING = dict(TIMING_PROFILES["default"])
+
+# 本进程内通过 async_pause() 累计的固定等待秒数
+SLEEP_STATS = {"seconds": 0.0}
+
+# 登录页地址可通过 KEEPALIVE_TARGET_URL 覆盖（例如指向本地基准测试服务器）
+TARGET_LOGIN_URL = os.environ.get("KEEPALIVE_TARGET_URL", "https://web.freecloud.ltd/index.php?rp=/login")
+# 会话恢复时直接访问的客户区地址；未登录时 WHMCS 会重定向回登录页 (rp=/login)
+CLIENT_AREA_URL = os.environ.get("KEEPALIVE_CLIENT_AREA_URL", urljoin(TARGET_LOGIN_URL, "clientarea.php"))
+LOGIN_URL_MARKER = "rp=/login"
+# 默认的页面加载超时与等待登录页（含 Cloudflare 验证）的最长时间（秒），可在账号文件中按账号覆盖
+GOTO_TIMEOUT = 120
+LOGIN_WAIT = 300
+
+# 启动 Chromium 前对登录页所在站点的预检（HEAD /）：每个阶段（连接 / TLS / 首字节）的超时秒数
+PROBE_TIMEOUT = 10
+# 反向代理（Cloudflare 等）报告源站不可用时的状态码，视同站点无法访问
+PROBE_DOWN_STATUSES = {502, 504, 521, 522, 523, 525, 526, 530}
+# 预检失败后间隔 PROBE_RETRY_DELAY 秒重试，共 PROBE_ATTEMPTS 次都失败才判定站点不可用（偶发的 502 不应让整轮保活落空）
+PROBE_ATTEMPTS = 2
+PROBE_RETRY_DELAY = 5
+# 预检很慢的站点延长导航超时：取预检总耗时的 PROBE_TIMEOUT_FACTOR 倍，限制在 [GOTO_TIMEOUT, GOTO_TIMEOUT_MAX] 内。
+# 只延长不缩短：预检只访问根路径，Cloudflare 验证页等慢加载仍需要 GOTO_TIMEOUT 的余量
+PROBE_TIMEOUT_FACTOR = 30
+GOTO_TIMEOUT_MAX = 240
+# 本轮的预检结果：{站点 origin: probe_site 的返回值}
+PROBES: dict = {}
+
+# 账号文件中的按账号覆盖项：{user: {"target_url", "client_area_url", "retries", "goto_timeout", "login_wait", "priority"}}
+ACCOUNT_OPTIONS: dict = {}
+
+# 每个账号的 storage_state（Cookie + localStorage）保存目录
+STATE_DIR = os.environ.get("KEEPALIVE_STATE_DIR", ".keepalive_state")
+
+# 分阶段耗时追踪：每个账号的每次尝试写一行 JSON（设为空字符串关闭）；
+# 文件超过 KEEPALIVE_TRACE_MAX_MB 时轮转为 <文件名>.1（只保留一份旧文件）
+TRACE_FILE = os.environ.get("KEEPALIVE_TRACE_FILE", "keepalive_trace.jsonl")
+# Telegram 报告中分阶段耗时表的阶段顺序
+PHASE_ORDER = ["launch", "restore", "context", "goto", "networkidle", "login_wait", "fill", "pause", "submit", "post_networkidle", "verify", "error", "artifacts"]
+
+# 每个账号最近一次观测到的暂停截止时间（由倒计时换算），供守护进程模式排期
+DEADLINES_PATH = os.path.join(STATE_DIR, "deadlines.json")
+
+# 选择器缓存：按站点记住上次成功的用户名 / 密码 / 提交选择器，下次优先尝试；
+# 缓存项连续未命中 SELECTOR_CACHE_MAX_MISSES 次后自动失效
+SELECTOR_CACHE_PATH = os.path.join(STATE_DIR, "selectors.json")
+SELECTOR_CACHE_MAX_MISSES = 3
+SELECTOR_CACHE: dict | None = None
+
+# 失败时的调试文件（截图 + gzip 压缩的 HTML）：在后台线程写盘，内容相同的页面只保存一次，
+# 目录总大小超过 KEEPALIVE_ARTIFACT_MAX_MB 时从最旧的文件开始删除
+ARTIFACT_DIR = os.environ.get("KEEPALIVE_ARTIFACT_DIR", "debug_artifacts")
+# 截图模式：full = 整页 PNG（原行为）；viewport = 仅可视区域 JPEG，更快更小；off = 不截图
+SCREENSHOT_MODE = os.environ.get("KEEPALIVE_SCREENSHOT", "full").strip().lower()
+SCREENSHOT_OPTIONS = {
+    "full": {"type": "png", "full_page": True},
+    "viewport": {"type": "jpeg", "quality": 60, "full_page": False},
+}
+ARTIFACT_EXECUTOR = None
+ARTIFACT_HASHES: set | None = None
+
+# Playwright trace 环形缓冲：按 KEEPALIVE_PW_TRACE_RATE 抽样录制表单登录尝试，
+# 成功的尝试直接丢弃，失败的保存为 zip，只保留最近 KEEPALIVE_PW_TRACE_KEEP 个
+PW_TRACE_DIR = os.path.join(ARTIFACT_DIR, "traces")
+
+# 按域名的熔断器：跨账号连续 KEEPALIVE_CIRCUIT_THRESHOLD 次连接层失败后打开，其余账号直接失败；
+# 打开 KEEPALIVE_CIRCUIT_COOLDOWN 秒后半开，只放行一次探测，探测成功则关闭、失败则重新打开
+CIRCUITS = {}
+CIRCUIT_LOCK = threading.Lock()
+
+# 模拟 Windows + Chrome 的指纹
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36",
+    "viewport": {'width': 1280, 'height': 800},
+    "locale": 'zh-CN',
+    "device_scale_factor": 1.0,
+}
+
+# 请求拦截策略（按站点配置，KEEPALIVE_BLOCK_RESOURCES=1 时启用）：
+# - blocked_types: 直接中止的资源类型（只需要登录表单和客户区文本）
+# - allowed_hosts: 其余请求只放行这些域名（含子域名），第三方统计/广告一律中止
+ROUTE_POLICIES = {
+    "web.freecloud.ltd": {
+        "blocked_types": ["image", "font", "media"],
+        "allowed_hosts": ["freecloud.ltd", "challenges.cloudflare.com"],
+    },
+}
+BLOCK_RESOURCES = os.environ.get("KEEPALIVE_BLOCK_RESOURCES", "0") == "1"
+
+# 事件驱动检测用：登录表单的 CSS 指标 + 页面可见文本指标（小写）
+LOGIN_FORM_SELECTOR = "input[type='email'], input[placeholder*='邮箱'], #inputEmail, #inputUsername, input[name='username'], input[name='email']"
+LOGIN_TEXT_INDICATORS = ["输入邮箱", "邮箱地址", "email", "邮箱", "登录用户中心", "登录", "登录到您的账户"]
+
+# 在页面内执行：登录表单出现，或统一匹配器命中登录文本即返回 true（由 wait_for_function 按帧检测）
+LOGIN_READY_JS = """
+([selector, source, loginTokens]) => {
+    if (document.querySelector(selector)) return true;
+    if (!document.body) return false;
+    const found = (document.body.innerText || '').toLowerCase().match(new RegExp(source, 'g')) || [];
+    return found.some(t => loginTokens.includes(t));
+}
+"""
+
+# 在页面内执行：是否处于 Cloudflare 验证页（Turnstile / Managed Challenge）
+CF_CHALLENGE_JS = """
+() => {
+    if (document.querySelector("iframe[src*='turnstile'], iframe[src*='cloudflare'], iframe[title*='challenge'], script[src*='challenge-platform']")) return true;
+    const text = ((document.title || '') + ' ' + (document.body ? document.body.innerText : '')).toLowerCase();
+    return text.includes('cloudflare') || text.includes('正在验证') || text.includes('checking your browser');
+}
+"""
+
+# 输入框候选：CSS 选择器；"role:" 前缀为按可访问名称匹配 textbox 的兜底，排在最后
+INPUT_SELECTORS = [
+    "input[placeholder*='邮箱']", "input[placeholder*='输入邮箱']",
+    "#inputEmail", "#inputUsername", "#username", "input[name='username']",
+    "input[name='email']", "input[type='email']", "role:email|邮箱"
+]
+PASSWORD_SELECTORS = ["input[placeholder*='密码']", "#inputPassword", "input[name='password']", "input[type='password']", "#password", "role:password|密码"]
+BUTTON_LABELS = ["登录", "Login", "Sign in", "Sign In", "Submit"]
+CSS_SUBMIT_CANDIDATES = ["button[type='submit']", "input[type='submit']", ".btn-primary", "form button", "form input[type='submit']"]
+# 提交方式候选：优先按钮文本，其次 CSS 选择器（"label:" / "css:" 前缀便于统一缓存）
+SUBMIT_CANDIDATES = [f"label:{label}" for label in BUTTON_LABELS] + [f"css:{sel}" for sel in CSS_SUBMIT_CANDIDATES]
+SUCCESS_SIGNS = ["dashboard", "client area", "my services", "time until suspension", "security settings", "用户中心", "控制台", "注销", "logout"]
+SUCCESS_URL_PARTS = ["/dashboard", "/clientarea", "/user", "/account", "/home"]
+# 失败标识分两组：credential_signs 只收明确指向账号 / 密码错误的提示（不重试）；
+# error_signs 为站点侧或原因不明的错误提示（重试）。登录页本身的文字（如注册链接）不能作为失败标识
+CREDENTIAL_SIGNS = ["wrong password", "密码错误", "invalid login", "invalid credentials", "邮箱或密码不正确"]
+ERROR_SIGNS = ["登录失败"]
+COUNTDOWN_PATTERN = re.compile(r"(\d+d\s+\d+h\s+\d+m\s+\d+s)")
+COUNTDOWN_ANCHOR = "time until suspension"
+
+# 在页面内执行：从 "Time until suspension" 之后的可见文本中提取倒计时，只回传匹配到的部分
+COUNTDOWN_JS = """
+([source, anchor]) => {
+    const text = (document.body && document.body.innerText) || '';
+    const at = text.toLowerCase().indexOf(anchor);
+    const m = (at >= 0 ? text.slice(at) : text).match(new RegExp(source));
+    return m ? m[1] : null;
+}
+"""
+
+# 站点注册表：每个托管面板的登录页、选择器、成功 / 失败标识和倒计时格式。
+# freecloud 即上面的默认常量（登录页可由 KEEPALIVE_TARGET_URL 覆盖）；
+# concurrency 为该站点的并发上限，None 表示沿用 KEEPALIVE_CONCURRENCY
+PROVIDERS = {
+    "freecloud": {
+        "login_url": TARGET_LOGIN_URL,
+        "client_area_url": CLIENT_AREA_URL,
+        "login_url_marker": LOGIN_URL_MARKER,
+        "login_form_selector": LOGIN_FORM_SELECTOR,
+        "login_indicators": LOGIN_TEXT_INDICATORS,
+        "input_selectors": INPUT_SELECTORS,
+        "password_selectors": PASSWORD_SELECTORS,
+        "submit_candidates": SUBMIT_CANDIDATES,
+        "success_signs": SUCCESS_SIGNS,
+        "success_url_parts": SUCCESS_URL_PARTS,
+        "credential_signs": CREDENTIAL_SIGNS,
+        "error_signs": ERROR_SIGNS,
+        "countdown_pattern": COUNTDOWN_PATTERN.pattern,
+        "countdown_anchor": COUNTDOWN_ANCHOR,
+        "concurrency": None,
+    },
+    "webhostmost": {
+        "login_url": "https://client.webhostmost.com/login",
+        "client_area_url": "https://client.webhostmost.com/clientarea.php",
+        "login_url_marker": "/login",
+        "login_form_selector": "#inputEmail, input[name='username'], input[type='email']",
+        "login_indicators": ["login", "email address", "forgot password?"],
+        "input_selectors": ["#inputEmail", "input[name='username']", "input[type='email']", "role:email|邮箱"],
+        "password_selectors": ["#inputPassword", "input[name='password']", "input[type='password']", "role:password|密码"],
+        "submit_candidates": ["css:#login", "label:Login", "css:button[type='submit']", "css:input[type='submit']"],
+        "success_signs": ["you are the exclusive owner of the following domains.", "client area", "logout"],
+        "success_url_parts": ["/clientarea", "/dashboard"],
+        "credential_signs": ["invalid credentials"],
+        "error_signs": ["not connected to server", "error with the login"],
+        "countdown_pattern": COUNTDOWN_PATTERN.pattern,
+        "countdown_anchor": COUNTDOWN_ANCHOR,
+        "concurrency": None,
+    },
+}
+# SITE_ACCOUNTS 中的账号使用的站点；账号文件可用 provider 字段按账号指定
+DEFAULT_PROVIDER = os.environ.get("KEEPALIVE_PROVIDER", "freecloud").strip().lower()
+COMPILED_PROVIDERS: dict = {}
+
+MATCH_SIGNS_JS = """
+(source) => {
+    const text = ((document.body && document.body.innerText) || '').toLowerCase();
+    return Array.from(new Set(text.match(new RegExp(source, 'g')) || []));
+}
+"""
+
+
+def apply_timing_profile(name: str) -> str:
+    """切换当前时间配置档，未知名称时回退为 default，返回实际生效的名称"""
+    name = (name or "default").strip().lower()
+    if name not in TIMING_PROFILES:
+        log(f"⚠️ 未知的时间配置档 '{name}'，可选: {', '.join(TIMING_PROFILES)}；回退为 default")
+        name = "default"
+    TIMING.clear()
+    TIMING.update(TIMING_PROFILES[name])
+    return name
+
+
+async def async_pause(seconds: float):
+    """asyncio.sleep 的包装，累计固定等待时长用于运行总结；等待期间让出事件循环给其他账号"""
+    if seconds <= 0:
+        return
+    import asyncio
+
+    SLEEP_STATS["seconds"] += seconds
+    await asyncio.sleep(seconds)
+
+
+def env_int(name: str, default: int) -> int:
+    """读取整数环境变量，未设置或格式错误时回退为默认值"""
+    raw = os.environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        log(f"⚠️ {name} 不是有效整数，回退为 {default}")
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """读取浮点数环境变量，未设置或格式错误时回退为默认值"""
+    raw = os.environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        log(f"⚠️ {name} 不是有效数字，回退为 {default}")
+        return default
+
+
+def account_slug(user: str) -> str:
+    """把账号名转换成可用作文件名的字符串"""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", user)
+
+
+def account_option(user: str, key: str, default):
+    """账号文件中该账号的覆盖项，未设置时返回默认值"""
+    return ACCOUNT_OPTIONS.get(user, {}).get(key, default)
+
+
+def provider_for(user: str) -> dict:
+    """账号所属站点（账号文件中的 provider 字段，默认 KEEPALIVE_PROVIDER）"""
+    return get_provider(account_option(user, "provider", DEFAULT_PROVIDER))
+
+
+def provider_concurrency(name: str, default: int) -> int:
+    """站点的并发上限：KEEPALIVE_CONCURRENCY_<站点名> > 注册表中的 concurrency > 全局 KEEPALIVE_CONCURRENCY"""
+    return env_int(f"KEEPALIVE_CONCURRENCY_{name.upper()}", get_provider(name)["concurrency"] or default)
+
+
+def login_url_for(user: str) -> str:
+    return account_option(user, "target_url", provider_for(user)["login_url"])
+
+
+def client_area_url_for(user: str) -> str:
+    """账号单独指定了登录页时，客户区默认取其同目录下的 clientarea.php"""
+    options = ACCOUNT_OPTIONS.get(user, {})
+    if "client_area_url" in options:
+        return options["client_area_url"]
+    if "target_url" in options:
+        return urljoin(options["target_url"], "clientarea.php")
+    return provider_for(user)["client_area_url"]
+
+
+def site_origin(url: str) -> str:
+    """URL 的 scheme://host[:port] 部分，预检结果按它缓存"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def probe_goto_timeout(probe: dict) -> float:
+    """按预检总耗时放大得到的导航超时（秒），不低于 GOTO_TIMEOUT"""
+    return min(GOTO_TIMEOUT_MAX, max(GOTO_TIMEOUT, round(probe["total"] * PROBE_TIMEOUT_FACTOR)))
+
+
+def goto_timeout_for(user: str) -> float:
+    """导航超时（秒）：账号覆盖项优先；其次按本轮预检测得的耗时对慢站点延长；没有预检结果时为 GOTO_TIMEOUT"""
+    probe = PROBES.get(site_origin(login_url_for(user)))
+    default = probe_goto_timeout(probe) if probe and probe["ok"] else GOTO_TIMEOUT
+    return account_option(user, "goto_timeout", default)
+
+
+def storage_state_path(user: str) -> str:
+    """账号对应的 storage_state 文件路径"""
+    return os.path.join(STATE_DIR, f"{account_slug(user)}.json")
+
+
+def get_route_policy(url: str) -> dict | None:
+    """按 URL 的域名查找请求拦截策略"""
+    return ROUTE_POLICIES.get(urlsplit(url).hostname or "")
+
+
+def host_allowed(host: str, allowed_hosts: list) -> bool:
+    """host 等于允许列表中的域名或是其子域名"""
+    return any(host == h or host.endswith("." + h) for h in allowed_hosts)
+
+
+def should_block_request(resource_type: str, url: str, policy: dict) -> bool:
+    """按资源类型和域名允许列表判断是否中止该请求"""
+    if resource_type in policy["blocked_types"]:
+        return True
+    host = urlsplit(url).hostname or ""
+    if not host:
+        # data: / blob: 等无域名请求不经过网络
+        return False
+    return not host_allowed(host, policy["allowed_hosts"])
+
+
+# 单次尝试的结果类型及其重试策略：确定性失败（凭据错误）立即放弃，只有暂时性失败才重试
+OUTCOMES = {
+    "success": {"label": "成功", "retry": False},
+    "invalid_credentials": {"label": "凭据无效", "retry": False},
+    "site_unreachable": {"label": "站点无法访问", "retry": True},
+    "unknown_state": {"label": "状态未知", "retry": True},
+    "timeout": {"label": "超时", "retry": True},
+    "login_error": {"label": "站点报错", "retry": True},
+    "circuit_open": {"label": "熔断跳过", "retry": False},
+}
+# 连接层错误（DNS 解析失败、连接被拒 / 重置 / 超时、TLS 握手失败），只有这些计入熔断器；
+# 导航超时（站点慢但可达）和 net::ERR_ABORTED 等页面层错误不算
+UNREACHABLE_PATTERN = re.compile(
+    r"net::ERR_(?:NAME_NOT_RESOLVED|NAME_RESOLUTION_FAILED|ADDRESS_UNREACHABLE|INTERNET_DISCONNECTED"
+    r"|CONNECTION_(?:REFUSED|RESET|CLOSED|FAILED|TIMED_OUT)|TIMED_OUT|EMPTY_RESPONSE|SSL_PROTOCOL_ERROR)"
+    r"|ECONNREFUSED|ENOTFOUND|ECONNRESET|Name or service not known"
+)
+
+
+class LoginError(RuntimeError):
+    """带结果类型的登录失败，outcome 为 OUTCOMES 中的键"""
+
+    def __init__(self, outcome: str, message: str):
+        super().__init__(message)
+        self.outcome = outcome
+
+
+def classify_error(error: BaseException) -> str:
+    """把一次尝试抛出的异常归类为 OUTCOMES 中的结果类型"""
+    outcome = getattr(error, "outcome", None)
+    if outcome in OUTCOMES:
+        return outcome
+    # playwright 的 TimeoutError 不继承内置 TimeoutError，按类名判断，分类时不必导入 playwright
+    if isinstance(error, TimeoutError) or type(error).__name__ == "TimeoutError":
+        return "timeout"
+    if UNREACHABLE_PATTERN.search(str(error)):
+        return "site_unreachable"
+    return "unknown_state"
+
+
+def should_retry(error: BaseException, attempt: int, max_retries: int) -> bool:
+    """第 attempt 次尝试失败后是否还应重试：次数未用完且该结果类型允许重试"""
+    return attempt <= max_retries and OUTCOMES[classify_error(error)]["retry"]
+
+
+def circuit_allow(host: str) -> bool:
+    """熔断器是否放行对 host 的一次尝试：关闭时放行；打开且冷却期已过时只放行一次半开探测"""
+    with CIRCUIT_LOCK:
+        circuit = CIRCUITS.get(host)
+        if circuit is None or circuit["opened_at"] is None:
+            return True
+        if circuit["probing"] or time.monotonic() - circuit["opened_at"] < env_float("KEEPALIVE_CIRCUIT_COOLDOWN", 300.0):
+            return False
+        circuit["probing"] = True
+    log(f"🔌 站点 {host} 熔断冷却结束，放行一次探测")
+    return True
+
+
+def circuit_record(host: str, reachable: bool | None):
+    """
+    记录一次尝试的连接结果：reachable 为 True（站点有响应）时复位；False（连接层失败）时累计，
+    达到阈值或半开探测失败时打开熔断；None（如导航超时，站点可能只是慢）不计数也不复位，
+    只在它是半开探测时重新进入冷却，避免探测名额一直被占用。
+    """
+    threshold = max(1, int(env_float("KEEPALIVE_CIRCUIT_THRESHOLD", 3)))
+    opening = False
+    with CIRCUIT_LOCK:
+        circuit = CIRCUITS.setdefault(host, {"failures": 0, "opened_at": None, "probing": False})
+        was_open = circuit["opened_at"] is not None
+        if reachable:
+            circuit.update(failures=0, opened_at=None, probing=False)
+        elif reachable is None:
+            if circuit["probing"]:
+                circuit.update(opened_at=time.monotonic(), probing=False)
+        else:
+            circuit["failures"] += 1
+            opening = circuit["probing"] or (not was_open and circuit["failures"] >= threshold)
+            if opening:
+                circuit.update(opened_at=time.monotonic(), probing=False)
+        failures = circuit["failures"]
+    if reachable and was_open:
+        log(f"🔌 站点 {host} 已恢复响应，熔断关闭")
+    elif opening and was_open:
+        log(f"🔌 站点 {host} 半开探测失败，熔断重新打开")
+    elif opening:
+        log(f"🔌 站点 {host} 连续 {failures} 次连接失败，熔断打开，其余账号直接失败")
+
+
+def check_circuit(USER: str, host: str, info: dict | None = None):
+    """熔断打开时不再启动浏览器上下文，直接以 circuit_open 结果失败"""
+    if circuit_allow(host):
+        return
+    log(f"⛔ 站点 {host} 熔断中，跳过账号 {USER}")
+    if info is not None:
+        info["outcome"] = "circuit_open"
+    raise LoginError("circuit_open", f"circuit-open: {host} 连续连接失败，已跳过")
+
+
+def new_account_info() -> dict:
+    """单个账号的结果信息：成功路径 + 结果类型 + 网络流量统计 + 每次尝试的分阶段耗时 + 倒计时"""
+    return {"path": None, "outcome": None, "requests": 0, "bytes": 0, "blocked": 0, "phases": [], "countdown": None}
+
+
+def phase_clock(spans: dict):
+    """返回 lap(name)：把自上一次 lap 以来经过的单调时钟时间累加到 spans[name]"""
+    last = [time.monotonic()]
+
+    def lap(name: str):
+        now = time.monotonic()
+        spans[name] = round(spans.get(name, 0.0) + now - last[0], 3)
+        last[0] = now
+
+    return lap
+
+
+def record_attempt(USER: str, attempt: int, spans: dict, outcome: str, error: str | None = None, info: dict | None = None):
+    """记录一次尝试的分阶段耗时：追加到 info["phases"]，并写一行 JSON 到追踪文件"""
+    if info is not None:
+        info["phases"].append(dict(spans))
+    if not TRACE_FILE:
+        return
+    record = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "user": USER,
+        "attempt": attempt,
+        "outcome": outcome,
+        "error": error,
+        "total": round(sum(spans.values()), 3),
+        "phases": spans,
+    }
+    try:
+        rotate_trace_file()
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        log(f"⚠️ 写入追踪文件失败: {e}")
+
+
+def rotate_trace_file():
+    """追踪文件超过 KEEPALIVE_TRACE_MAX_MB 时改名为 <文件名>.1（覆盖上一份），之后从空文件继续写；0 表示不限制"""
+    limit = env_int("KEEPALIVE_TRACE_MAX_MB", 10) * 1024 * 1024
+    if limit <= 0:
+        return
+    try:
+        size = os.path.getsize(TRACE_FILE)
+    except OSError:
+        return
+    if size >= limit:
+        os.replace(TRACE_FILE, TRACE_FILE + ".1")
+
+
+def queue_artifacts(USER: str, screenshot: bytes | None, html: str | None):
+    """把已在页面线程上截取的截图 / HTML 交给后台线程写盘，调用方无需等待磁盘 IO"""
+    global ARTIFACT_EXECUTOR
+    if screenshot is None and html is None:
+        return
+    if ARTIFACT_EXECUTOR is None:
+        ARTIFACT_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifacts")
+    timestamp = datetime.now().strftime("%Y%m%dT%H%M%SZ")
+    ARTIFACT_EXECUTOR.submit(write_artifacts, USER, timestamp, screenshot, html)
+
+
+def known_artifact_hashes() -> set:
+    """已保存页面的内容哈希（取自文件名），跨运行去重"""
+    global ARTIFACT_HASHES
+    if ARTIFACT_HASHES is None:
+        ARTIFACT_HASHES = set()
+        try:
+            for name in os.listdir(ARTIFACT_DIR):
+                m = re.search(r"_([0-9a-f]{12})\.", name)
+                if m:
+                    ARTIFACT_HASHES.add(m.group(1))
+        except OSError:
+            pass
+    return ARTIFACT_HASHES
+
+
+def write_artifacts(USER: str, timestamp: str, screenshot: bytes | None, html: str | None):
+    """后台线程：按内容哈希去重，HTML 以 gzip 写入，然后执行总大小上限"""
+    try:
+        body = html.encode("utf-8") if html is not None else screenshot
+        digest = hashlib.sha256(body).hexdigest()[:12]
+        hashes = known_artifact_hashes()
+        if digest in hashes:
+            log(f"ℹ️ 账号 {USER} 的失败页面与已保存的内容相同 ({digest})，跳过调试文件")
+            return
+        hashes.add(digest)
+        os.makedirs(ARTIFACT_DIR, exist_ok=True)
+        stem = f"{account_slug(USER)}_{timestamp}_{digest}"
+        if screenshot is not None:
+            ext = "png" if SCREENSHOT_OPTIONS.get(SCREENSHOT_MODE, {}).get("type", "png") == "png" else "jpg"
+            screenshot_path = os.path.join(ARTIFACT_DIR, f"screenshot_{stem}.{ext}")
+            with open(screenshot_path, "wb") as f:
+                f.write(screenshot)
+            log(f"📷 已保存截图: {screenshot_path}")
+        if html is not None:
+            html_path = os.path.join(ARTIFACT_DIR, f"page_{stem}.html.gz")
+            with gzip.open(html_path, "wb", compresslevel=6) as f:
+                f.write(body)
+            log(f"📝 已保存页面 HTML: {html_path}")
+        enforce_artifact_cap()
+    except Exception as e:
+        log(f"⚠️ 写入调试文件时发生异常: {e}")
+
+
+def enforce_artifact_cap():
+    """目录总大小超过上限时，按修改时间从旧到新删除"""
+    limit = env_int("KEEPALIVE_ARTIFACT_MAX_MB", 50) * 1024 * 1024
+    files = []
+    for name in os.listdir(ARTIFACT_DIR):
+        path = os.path.join(ARTIFACT_DIR, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            log(f"🗑️ 调试文件超出 {limit // (1024 * 1024)}MB 上限，已删除最旧的 {path}")
+        except OSError:
+            pass
+
+
+def should_trace() -> bool:
+    """按抽样率决定本次尝试是否录制 Playwright trace"""
+    rate = env_float("KEEPALIVE_PW_TRACE_RATE", 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def failure_trace_path(USER: str, attempt: int) -> str:
+    os.makedirs(PW_TRACE_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%dT%H%M%SZ")
+    return os.path.join(PW_TRACE_DIR, f"trace_{account_slug(USER)}_{timestamp}_{attempt}.zip")
+
+
+def trim_trace_ring():
+    """只保留最近 KEEPALIVE_PW_TRACE_KEEP 个失败 trace，其余按修改时间从旧到新删除"""
+    keep = max(env_int("KEEPALIVE_PW_TRACE_KEEP", 10), 0)
+    try:
+        traces = sorted((os.path.join(PW_TRACE_DIR, name) for name in os.listdir(PW_TRACE_DIR) if name.endswith(".zip")),
+                        key=os.path.getmtime)
+    except OSError:
+        return
+    for path in traces[:max(len(traces) - keep, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def flush_artifacts():
+    """等待后台队列中的调试文件全部写完"""
+    global ARTIFACT_EXECUTOR
+    if ARTIFACT_EXECUTOR is not None:
+        ARTIFACT_EXECUTOR.shutdown(wait=True)
+        ARTIFACT_EXECUTOR = None
+
+
+def percentile(values: list, pct: float) -> float:
+    """最近秩法百分位数"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def format_phase_table(phase_records: list) -> str:
+    """把所有尝试的分阶段耗时汇总成 p50 / p95 表（Markdown 代码块）"""
+    samples = {}
+    for spans in phase_records:
+        for name, seconds in spans.items():
+            samples.setdefault(name, []).append(seconds)
+    if not samples:
+        return ""
+    names = [n for n in PHASE_ORDER if n in samples] + sorted(n for n in samples if n not in PHASE_ORDER)
+    rows = [f"{'phase':<16}{'n':>4}{'p50':>8}{'p95':>8}"]
+    for name in names:
+        values = samples[name]
+        rows.append(f"{name:<16}{len(values):>4}{percentile(values, 50):>7.1f}s{percentile(values, 95):>7.1f}s")
+    return "```\n" + "\n".join(rows) + "\n```"
+
+
+def format_traffic(info: dict) -> str:
+    """把流量统计格式化为报告中的简短说明"""
+    text = f"{info['requests']} 请求 / {info['bytes'] / 1024:.0f}KB"
+    if info["blocked"]:
+        text += f", 拦截 {info['blocked']} 请求"
+    return text
+
+
+def get_provider(name: str | None = None) -> dict:
+    """
+    取站点配置并编译（每个进程每个站点只编译一次）：成功 / 凭据错误 / 站点报错 / 登录页四组标识编译成一个交替正则（长词优先），
+    在页面内对 document.body.innerText 只执行一次，只回传命中的标识。
+    """
+    name = name or DEFAULT_PROVIDER
+    if name not in COMPILED_PROVIDERS:
+        if name not in PROVIDERS:
+            raise ValueError(f"未知的站点 '{name}'，可选: {', '.join(PROVIDERS)}")
+        spec = PROVIDERS[name]
+        token_groups = {}  # 标识 (小写) -> 所属分组集合
+        for group, key in (("success", "success_signs"), ("credential", "credential_signs"), ("error", "error_signs"),
+                           ("login", "login_indicators")):
+            for token in spec[key]:
+                token_groups.setdefault(token.lower(), set()).add(group)
+        COMPILED_PROVIDERS[name] = {
+            **spec,
+            "name": name,
+            "token_groups": token_groups,
+            "sign_pattern": re.compile("|".join(re.escape(t) for t in sorted(token_groups, key=len, reverse=True))),
+            "login_tokens": sorted(t for t, groups in token_groups.items() if "login" in groups),
+            "countdown_re": re.compile(spec["countdown_pattern"]),
+        }
+    return COMPILED_PROVIDERS[name]
+
+
+def match_signs(text_lower: str, provider: dict | None = None) -> set:
+    """在 Python 侧用统一匹配器扫描文本（用于 HTTP 快速校验的响应）"""
+    provider = provider or get_provider()
+    return set(provider["sign_pattern"].findall(text_lower))
+
+
+def has_sign(tokens: set, group: str, provider: dict | None = None) -> bool:
+    """命中的标识中是否包含某一组 (success / credential / error / login)"""
+    token_groups = (provider or get_provider())["token_groups"]
+    return any(group in token_groups.get(t, ()) for t in tokens)
+
+
+def load_selector_cache() -> dict:
+    """读取选择器缓存（每个进程只读一次磁盘）"""
+    global SELECTOR_CACHE
+    if SELECTOR_CACHE is None:
+        try:
+            with open(SELECTOR_CACHE_PATH, "r", encoding="utf-8") as f:
+                SELECTOR_CACHE = json.load(f)
+        except (OSError, ValueError):
+            SELECTOR_CACHE = {}
+    return SELECTOR_CACHE
+
+
+def save_selector_cache():
+    """原子写入选择器缓存"""
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        tmp_path = SELECTOR_CACHE_PATH + f".{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(load_selector_cache(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, SELECTOR_CACHE_PATH)
+    except OSError as e:
+        log(f"⚠️ 保存选择器缓存失败: {e}")
+
+
+def cached_order(field: str, candidates: list, site_url: str | None = None) -> tuple:
+    """
+    把缓存中该字段上次成功的选择器排到最前面（按 site_url 的主机名区分站点，默认 TARGET_LOGIN_URL）。
+    返回 (排序后的候选列表, 缓存的选择器或 None)。
+    """
+    site = urlsplit(site_url or TARGET_LOGIN_URL).hostname or ""
+    entry = load_selector_cache().get(site, {}).get(field)
+    cached = entry["selector"] if entry and entry.get("selector") in candidates else None
+    if cached is None:
+        return list(candidates), None
+    return [cached] + [c for c in candidates if c != cached], cached
+
+
+def settle_selector(field: str, cached: str | None, winner: str | None, site_url: str | None = None):
+    """
+    根据本次实际成功的选择器更新缓存：命中则清零未命中计数；
+    未命中累计到上限后用本次成功的选择器替换（或直接删除）缓存项。
+    """
+    site = urlsplit(site_url or TARGET_LOGIN_URL).hostname or ""
+    site_cache = load_selector_cache().setdefault(site, {})
+    entry = site_cache.get(field)
+
+    if cached is not None and winner == cached:
+        if entry.get("misses"):
+            entry["misses"] = 0
+            save_selector_cache()
+        return
+
+    if cached is not None:
+        entry["misses"] = entry.get("misses", 0) + 1
+        if entry["misses"] < SELECTOR_CACHE_MAX_MISSES:
+            save_selector_cache()
+            return
+        log(f"ℹ️ 选择器缓存 {site}/{field} 连续 {entry['misses']} 次未命中，已失效")
+        site_cache.pop(field, None)
+
+    if winner is not None:
+        site_cache[field] = {"selector": winner, "misses": 0}
+    save_selector_cache()
+
+
+def find_countdown(text: str, provider: dict | None = None) -> str | None:
+    """在文本（HTML 或 innerText）中查找 "Time until suspension" 之后的倒计时"""
+    provider = provider or get_provider()
+    at = text.lower().find(provider["countdown_anchor"])
+    m = provider["countdown_re"].search(text[at:] if at >= 0 else text)
+    return m.group(1) if m else None
+
+
+def parse_countdown(countdown: str) -> int:
+    """把 "12d 3h 4m 5s" 换算成秒数"""
+    days, hours, minutes, seconds = (int(x) for x in re.findall(r"\d+", countdown))
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def load_deadlines() -> dict:
+    """读取 {user: {"deadline", "observed_at", "countdown"}}，时间为 Unix 时间戳"""
+    try:
+        with open(DEADLINES_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_deadlines(deadlines: dict):
+    """原子写入截止时间记录"""
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        tmp_path = DEADLINES_PATH + f".{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(deadlines, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, DEADLINES_PATH)
+    except OSError as e:
+        log(f"⚠️ 保存截止时间记录失败: {e}")
+
+
+def record_deadlines(results: list):
+    """把本轮各账号提取到的倒计时换算成绝对截止时间并持久化"""
+    observed = [(user, info["countdown"]) for user, error, info in results if error is None and info.get("countdown")]
+    if not observed:
+        return
+    deadlines = load_deadlines()
+    now = time.time()
+    for user, countdown in observed:
+        deadlines[user] = {
+            "deadline": now + parse_countdown(countdown),
+            "observed_at": now,
+            "countdown": countdown,
+        }
+    save_deadlines(deadlines)
+
+
+def split_far_deadlines(accounts: list, threshold_days: int) -> tuple:
+    """
+    按保存的截止时间筛掉剩余天数超过 threshold_days 的账号（不创建浏览器上下文）。
+    返回 (跳过的 {下标: (user, None, info)}, 仍需处理的 [(下标, user, pwd), ...])。
+    threshold_days <= 0 时不跳过任何账号。
+    """
+    indexed = [(i, user, pwd) for i, (user, pwd) in enumerate(accounts)]
+    if threshold_days <= 0:
+        return {}, indexed
+    deadlines = load_deadlines()
+    now = time.time()
+    skipped = {}
+    pending = []
+    for index, user, pwd in indexed:
+        entry = deadlines.get(user)
+        days_left = (entry["deadline"] - now) / 86400 if entry else 0
+        if days_left > threshold_days:
+            log(f"⏭️ 账号 {user} 距暂停还有 {days_left:.1f} 天（观测于 {datetime.fromtimestamp(entry['observed_at']).strftime('%Y-%m-%d %H:%M')}），本次跳过")
+            info = new_account_info()
+            info["path"] = "skipped"
+            info["days_left"] = int(days_left)
+            skipped[index] = (user, None, info)
+        else:
+            pending.append((index, user, pwd))
+    return skipped, pending
+
+
+def is_logged_in(tokens: set, current_url: str, provider: dict | None = None) -> bool:
+    """Step 5 的成功判定：页面出现成功标识，或 URL 已跳转到登录后的页面"""
+    provider = provider or get_provider()
+    return has_sign(tokens, "success", provider) or any(x in current_url for x in provider["success_url_parts"])
+
+
+def session_valid(tokens: set, current_url: str, provider: dict | None = None) -> bool:
+    """
+    会话恢复 / HTTP 快速校验的成功判定。这两条路径请求的本来就是客户区地址，URL 不能证明已登录
+    （Cloudflare 验证页或内嵌登录表单也会停留在同一地址），因此只认页面内的成功标识，
+    且不能被重定向回登录页。
+    """
+    provider = provider or get_provider()
+    return provider["login_url_marker"] not in current_url and has_sign(tokens, "success", provider)
+
+
+def escape_markdown(text: str) -> str:
+    """仅转义 Telegram Markdown 中需要转义的字符"""
+    return text.replace("_", "\\_").replace("*", "\\*").replace("[", "\\[").replace("`", "\\`").replace("(", "\\(").replace(")", "\\)")
+
+
+# --- 4. 登录函数 (核心优化区域) ---
+
+
+async def async_launch_browser(playwright: AsyncPlaywright, stats: dict | None = None) -> AsyncBrowser:
+    """启动一次 Chromium，供整轮运行的所有账号和重试共享；stats 记录启动次数和耗时"""
+    started = time.monotonic()
+    # === 关键修改 1: 切换到 Chromium 并启用 slow_mo ===
+    browser = await playwright.chromium.launch(
+        headless=True,
+        proxy=None,
+        slow_mo=TIMING["slow_mo_ms"] # 增加操作延迟
+    )
+    if stats is not None:
+        stats["launches"] = stats.get("launches", 0) + 1
+        stats.setdefault("launch_seconds", []).append(round(time.monotonic() - started, 3))
+    return browser
+
+
+async def async_new_account_context(browser: AsyncBrowser, stats: dict | None = None, info: dict | None = None, site_url: str | None = None, **options) -> AsyncBrowserContext:
+    """
+    新建隔离的 BrowserContext：累计 Context 数量，统计响应流量，
+    并在启用 KEEPALIVE_BLOCK_RESOURCES 时安装请求拦截策略。
+    """
+    context = await browser.new_context(**CONTEXT_OPTIONS, **options)
+    if stats is not None:
+        stats["contexts"] = stats.get("contexts", 0) + 1
+    if info is None:
+        return context
+
+    def on_response(response):
+        info["requests"] += 1
+        try:
+            info["bytes"] += int(response.headers.get("content-length", 0))
+        except ValueError:
+            pass
+
+    context.on("response", on_response)
+
+    policy = get_route_policy(site_url or TARGET_LOGIN_URL)
+    if BLOCK_RESOURCES and policy:
+        async def handle_route(route):
+            request = route.request
+            if should_block_request(request.resource_type, request.url, policy):
+                info["blocked"] += 1
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await context.route("**/*", handle_route)
+    return context
+
+
+async def async_try_restore_session(browser: AsyncBrowser, USER: str, stats: dict | None = None, info: dict | None = None) -> bool:
+    """
+    用上次保存的 storage_state 打开 Context 并直接访问客户区。
+    命中成功标识（且未被重定向回登录页）即视为保活成功，并刷新保存的会话；
+    否则返回 False 交由表单登录流程处理。只有明确被重定向回登录页时才删除会话文件，
+    导航超时、网络错误、Cloudflare 验证页等偶发情况保留会话，下次运行再试。
+    """
+    state_path = storage_state_path(USER)
+    if not os.path.exists(state_path):
+        return False
+
+    context: AsyncBrowserContext | None = None
+    expired = False
+    try:
+        context = await async_new_account_context(browser, stats, info, site_url=login_url_for(USER), storage_state=state_path)
+        page = await context.new_page()
+        await page.goto(client_area_url_for(USER), timeout=goto_timeout_for(USER) * 1000)
+        try:
+            await page.wait_for_load_state("networkidle", timeout=60000)
+        except Exception:
+            log("⚠️ 会话恢复 networkidle 超时，继续检测页面内容")
+
+        current_url = page.url or ""
+        provider = provider_for(USER)
+        tokens = await async_page_signs(page, provider)
+        if session_valid(tokens, current_url, provider):
+            log(f"✅ 账号 {USER} 已通过保存的会话直接进入客户区（跳过登录表单）")
+            await async_extract_countdown(page, USER, info, provider)
+            await context.storage_state(path=state_path)
+            return True
+        expired = provider["login_url_marker"] in current_url
+        if expired:
+            log(f"ℹ️ 账号 {USER} 保存的会话已失效，改用登录表单")
+        else:
+            log(f"⚠️ 账号 {USER} 会话恢复未到达客户区（{current_url}），保留会话，改用登录表单")
+    except Exception as e:
+        log(f"⚠️ 账号 {USER} 会话恢复失败: {e}")
+    finally:
+        try:
+            if context: await context.close()
+        except Exception as e:
+            log(f"⚠️ 关闭浏览器上下文时出错: {e}")
+
+    if expired:
+        try:
+            os.remove(state_path)
+        except OSError:
+            pass
+    return False
+
+
+async def async_save_session(context, USER: str):
+    """登录成功后保存 storage_state，供下次运行直接恢复会话"""
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        await context.storage_state(path=storage_state_path(USER))
+        log(f"💾 已保存账号 {USER} 的会话状态")
+    except Exception as e:
+        log(f"⚠️ 保存会话状态失败: {e}")
 
-# --- 1. 日志函数 (公共) ---
-def log(message: str):
-    """一个简单的日志打印函数"""
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
 
-# --- 2. Telegram 通知函数 ---
-def send_telegram_message(bot_token, chat_id, message, proxy_url: str | None = None):
-    """使用 requests 向 Telegram Bot API 发送消息 (支持代理)"""
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    payload = {
-        'chat_id': chat_id,
-        'text': message,
-        'parse_mode': 'Markdown'
-    }
+def field_locator(page: AsyncPage, selector: str):
+    """输入框候选："role:<正则>" 按可访问名称匹配 textbox（更健壮的兜底），其余按 CSS 选择器"""
+    if selector.startswith("role:"):
+        return page.get_by_role("textbox", name=re.compile(selector[len("role:"):], re.IGNORECASE))
+    return page.locator(selector)
 
-    # --- 设置代理 ---
-    proxies = None
-    if proxy_url:
-        proxies = {
-            'http': proxy_url,
-            'https': proxy_url
-        }
-        log(f"ℹ️ 检测到 TELEGRAM_PROXY，将使用代理: {proxy_url}")
-    # --- 代理设置完毕 ---
 
+async def async_click_submit_candidate(page: AsyncPage, candidate: str) -> bool:
+    """按 "label:" / "css:" 候选尝试点击提交按钮，成功返回 True"""
+    kind, _, value = candidate.partition(":")
     try:
-        response = requests.post(url, json=payload, timeout=10, proxies=proxies)
-        if response.status_code == 200:
-            log("✅ Telegram 消息发送成功")
-        else:
-            log(f"❌ Telegram 消息发送失败: {response.status_code} - {response.text}")
+        if kind == "label":
+            # 使用更具弹性的正则表达式匹配
+            await page.get_by_role("button", name=re.compile(value, re.IGNORECASE)).click(timeout=5000)
+            log(f"🔘 点击按钮 '{value}' 尝试登录")
+            return True
+        loc = page.locator(value)
+        if await loc.count() and await loc.first.is_visible():
+            await loc.first.click(timeout=4000)
+            log(f"🔘 点击 CSS 按钮: {value}")
+            return True
+    except Exception:
+        pass
+    return False
+
+
+async def async_extract_countdown(page: AsyncPage, USER: str, info: dict | None = None, provider: dict | None = None) -> str | None:
+    """在页面内提取 "Time until suspension" 倒计时，写入 info["countdown"]"""
+    provider = provider or get_provider()
+    try:
+        countdown = await page.evaluate(COUNTDOWN_JS, [provider["countdown_pattern"], provider["countdown_anchor"]])
+    except Exception:
+        countdown = None
+    if countdown:
+        log(f"⏱️ 账号 {USER} 检测到倒计时: {countdown}")
+        if info is not None:
+            info["countdown"] = countdown
+    return countdown
+
+
+async def async_capture_artifacts(page: AsyncPage, USER: str):
+    """截取失败页面的截图（按 KEEPALIVE_SCREENSHOT）和 HTML，排入后台写盘队列"""
+    screenshot = html = None
+    options = SCREENSHOT_OPTIONS.get(SCREENSHOT_MODE)
+    if options:
+        try:
+            screenshot = await page.screenshot(**options)
+        except Exception as ex_s:
+            log(f"⚠️ 保存截图失败: {ex_s}")
+    try:
+        html = await page.content()
+    except Exception as ex_h:
+        log(f"⚠️ 保存 HTML 失败: {ex_h}")
+    queue_artifacts(USER, screenshot, html)
+
+
+async def async_save_failure_trace(context: AsyncBrowserContext, USER: str, attempt: int) -> bool:
+    """停止录制并把失败尝试的 trace 写入环形缓冲目录"""
+    try:
+        path = failure_trace_path(USER, attempt)
+        await context.tracing.stop(path=path)
+        log(f"🎞️ 已保存 Playwright trace: {path}")
+        trim_trace_ring()
+        return True
+    except Exception as e:
+        log(f"⚠️ 保存 Playwright trace 失败: {e}")
+        return False
+
+
+async def async_page_signs(page: AsyncPage, provider: dict | None = None) -> set:
+    """在页面内执行统一匹配器，返回命中的标识集合；页面不可用时返回空集合"""
+    provider = provider or get_provider()
+    try:
+        return set(await page.evaluate(MATCH_SIGNS_JS, provider["sign_pattern"].pattern))
+    except Exception:
+        return set()
+
+
+async def async_click_turnstile(page: AsyncPage):
+    """尝试点击 Turnstile iframe 内的验证元素"""
+    # --- 关键修改 4：更具鲁棒性的 Turnstile 点击尝试 ---
+    try:
+        turnstile_iframe_handle = await page.query_selector("iframe[src*='turnstile']")
+        if turnstile_iframe_handle:
+            log("ℹ️ 检测到 Turnstile iframe，正在切换并尝试点击... (1/3)")
+            turnstile_frame = await turnstile_iframe_handle.content_frame()
+            if turnstile_frame:
+                # 尝试点击 iframe 内部的可见元素，而不是隐藏的 input[type=checkbox]
+                checkbox_locator = turnstile_frame.locator("body *").filter(has_text=re.compile("Verify you are human", re.IGNORECASE))
+                if await checkbox_locator.count() > 0:
+                    # 优先点击包含 'Verify you are human' 文本的元素
+                    await checkbox_locator.first.click(timeout=5000, force=True)
+                    log("✅ 已尝试点击 Turnstile 验证文本 (2/3)")
+                else:
+                    # 如果没有找到文本，尝试点击 iframe 内部的复选框
+                    await turnstile_frame.locator("input[type=checkbox]").click(timeout=5000, force=True)
+                    log("✅ 已尝试点击 Turnstile 复选框 (2/3)")
+
+                # 增加一个短暂的等待，给 CF 留出处理点击的时间
+                await async_pause(TIMING["turnstile_pause"])
+                log("ℹ️ 点击操作已完成 (3/3)")
+            else:
+                log("⚠️ 找到了 iframe 但无法获取其 content_frame")
     except Exception as e:
-        log(f"❌ 发送 Telegram 消息时发生异常: {e}")
+        log(f"ℹ️ 自动点击 Turnstile 失败 (可能元素未出现或被遮挡): {e}")
 
 
-# --- 3. 登录函数 (核心优化区域) ---
+async def async_wait_for_login_page(page: AsyncPage, max_wait: float, provider: dict | None = None) -> tuple:
+    """
+    事件驱动地等待登录页：在页面内用 wait_for_function 检测登录表单指标，表单一出现立即返回，
+    不再每 3 秒复制整页 HTML。每个检测切片 (poll_interval) 超时后才检查 Cloudflare 并尝试点击 Turnstile。
+    返回 (login_page_reached, saw_cf)。
+    """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    provider = provider or get_provider()
+    ready_arg = [provider["login_form_selector"], provider["sign_pattern"].pattern, provider["login_tokens"]]
+    deadline = time.monotonic() + max_wait
+    saw_cf = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or page.is_closed():
+            return False, saw_cf
+        slice_ms = max(min(remaining, TIMING["poll_interval"]), 0.1) * 1000
+        try:
+            await page.wait_for_function(LOGIN_READY_JS, arg=ready_arg, polling="raf", timeout=slice_ms)
+            return True, saw_cf
+        except PlaywrightTimeoutError:
+            pass
+        except Exception:
+            # CF 通过后的跳转会销毁执行上下文，等新页面 DOM 就绪后继续检测
+            try:
+                await page.wait_for_load_state("domcontentloaded", timeout=slice_ms)
+            except Exception:
+                pass
+
+        try:
+            cf_flag = bool(await page.evaluate(CF_CHALLENGE_JS))
+        except Exception:
+            cf_flag = False
+
+        if cf_flag and not saw_cf:
+            saw_cf = True
+            log(f"⚠️ 检测到 Cloudflare 验证页面，等待其自动通过（最多等待 {max_wait}s）...")
 
-def login_account(playwright: Playwright, USER: str, PWD: str, max_retries: int = 2):
+        if saw_cf:
+            await async_click_turnstile(page)
+
+
+async def async_login_attempt(browser: AsyncBrowser, USER: str, PWD: str, attempt: int, max_retries: int = 2, stats: dict | None = None, info: dict | None = None) -> str:
     """
-    针对 web.freecloud.ltd 的稳健登录 / 保活函数：
-    - 切换回 Chromium，并增加 Playwright Context 的“人性化”配置，减少被识别为自动化的几率。
-    - 增加 slow_mo 延迟，模拟人类操作。
+    针对 web.freecloud.ltd 的稳健登录 / 保活函数的单次尝试（第 attempt 次，共 max_retries + 1 次）：
+    - 复用 main() 中启动的同一个 Chromium，每次尝试只新建一个隔离的 BrowserContext（Cookie 互不影响）。
+    - 增加 Playwright Context 的“人性化”配置，减少被识别为自动化的几率。
+    - stats（可选）用于累计本轮创建的 Context 数量，以统计节省的浏览器启动次数。
+    - 第 1 次尝试优先用保存的 storage_state 恢复会话，只有恢复失败时才走 Step 1-5 的表单登录。
+    - info（可选）用于累计该账号的请求数、下载字节数、被拦截的请求数和每次尝试的分阶段耗时。
+    - 账号文件中的覆盖项（登录页、超时）优先于默认值。
+    成功返回登录路径；失败时保存诊断信息、记录耗时后抛出异常。是否重试、何时重试由运行引擎的
+    延后重试队列决定，本函数内不等待。
     """
-    attempt = 0
-    # 增加 slow_mo 延迟，模拟人类操作
-    slow_mo_ms = 500 
-    
-    while attempt <= max_retries:
-        attempt += 1
-        log(f"🚀 开始登录账号: {USER} (尝试 {attempt}/{max_retries + 1})")
-        browser: Browser | None = None
-        context: BrowserContext | None = None
-        page: Page | None = None
-        
+    provider = provider_for(USER)
+    login_url = login_url_for(USER)
+    goto_timeout_ms = goto_timeout_for(USER) * 1000
+    host = urlsplit(login_url).hostname or ""
+    check_circuit(USER, host, info)
+    if attempt == 1 and os.path.exists(storage_state_path(USER)):
+        spans = {}
+        lap = phase_clock(spans)
+        restored = await async_try_restore_session(browser, USER, stats, info)
+        lap("restore")
+        record_attempt(USER, 0, spans, "success" if restored else "restore-miss", info=info)
+        if restored:
+            if info is not None:
+                info["outcome"] = "success"
+            circuit_record(host, True)
+            return "session"
+
+    log(f"🚀 开始登录账号: {USER} (尝试 {attempt}/{max_retries + 1})")
+    context: AsyncBrowserContext | None = None
+    page: AsyncPage | None = None
+    spans = {}
+    lap = phase_clock(spans)
+    outcome, error_text = "error", None
+    tracing = False
+
+    try:
+        # === 关键修改 2: 增强 Context 配置，模拟真实设备指纹 ===
+        context = await async_new_account_context(browser, stats, info, site_url=login_url)
+        # === 修改完毕 ===
+        if should_trace():
+            await context.tracing.start(screenshots=True, snapshots=True)
+            tracing = True
+
+        page = await context.new_page()
+        lap("context")
+
+        # 增加初始页面加载超时，以应对可能较长的 CF 验证过程
+        await page.goto(login_url, timeout=goto_timeout_ms)
+        lap("goto")
+
         try:
-            # === 关键修改 1: 切换到 Chromium 并启用 slow_mo ===
-            browser = playwright.chromium.launch(
-                headless=True,
-                proxy=None,
-                slow_mo=slow_mo_ms # 增加操作延迟
-            )
-            # === 修改完毕 ===
-            
-            # === 关键修改 2: 增强 Context 配置，模拟真实设备指纹 ===
-            context = browser.new_context(
-                # 模拟 Windows + Chrome 的指纹
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36",
-                viewport={'width': 1280, 'height': 800},
-                locale='zh-CN',
-                device_scale_factor=1.0,
-            )
-            # === 修改完毕 ===
-
-            page = context.new_page()
-
-            target_login_url = "https://web.freecloud.ltd/index.php?rp=/login"
-            # 增加初始页面加载超时，以应对可能较长的 CF 验证过程
-            page.goto(target_login_url, timeout=120000) 
-            
+            await page.wait_for_load_state("networkidle", timeout=60000)
+        except:
+            log("⚠️ 首次 networkidle 超时，页面可能仍在验证或加载")
+        lap("networkidle")
+
+        # ==== 特殊逻辑：检测 Cloudflare 验证并等待通过（事件驱动，表单出现即继续） ====
+        max_wait = account_option(USER, "login_wait", LOGIN_WAIT)  # <-- 关键修改 3：默认延长到 300s (5分钟)
+        login_page_reached, saw_cf = await async_wait_for_login_page(page, max_wait, provider)
+        lap("login_wait")
+
+        # CF/登录页状态判定
+        if saw_cf and login_page_reached:
+            log("✅ Cloudflare 验证已通过，页面已到达登录页")
+        elif saw_cf and not login_page_reached:
+            log(f"❌ 等待 Cloudflare 验证超时（{max_wait}s），未到达登录页")
+            raise LoginError("timeout", "cf-timeout")
+        elif login_page_reached:
+            log("ℹ️ 直接到达登录页（未检测到明显 Cloudflare 验证）")
+        else:
+            log("⚠️ 未检测到登录页或 Cloudflare 验证标志，页面可能异常")
+            raise LoginError("unknown_state", "no-login-or-cf")
+
+        # === Step 1: 尝试填写用户名/邮箱（缓存的选择器优先） ===
+        input_selectors, cached_user = cached_order("user", provider["input_selectors"], login_url)
+        filled_user = False
+        for selector in input_selectors:
             try:
-                page.wait_for_load_state("networkidle", timeout=60000)
-            except:
-                log("⚠️ 首次 networkidle 超时，页面可能仍在验证或加载")
-
-            # ==== 特殊逻辑：检测 Cloudflare 验证并等待通过 ====
-            start = time.time()
-            max_wait = 300  # <-- 关键修改 3：延长到 300s (5分钟)
-            saw_cf = False
-            login_page_reached = False
-
-            login_indicators = [
-                "输入邮箱", "邮箱地址", "Email", "邮箱",
-                "登录用户中心", "登录", "登录到您的账户",
-                "placeholder=\"输入邮箱\"", "input[type=\"email\"]"
-            ]
-
-            while time.time() - start < max_wait:
-                html_lower = ""
-                try:
-                    html_lower = page.content().lower()
-                except Exception:
-                    html_lower = ""
+                # 每个候选单独判断，缓存中记录的就是实际匹配到的那一个
+                email_input = field_locator(page, selector)
+                if await email_input.count() > 0 and await email_input.first.is_visible():
+                    await email_input.first.fill(USER)
+                    log(f"📝 填入用户名/邮箱 (Selector: {selector})")
+                    filled_user = selector
+                    break
+            except Exception:
+                continue
+        settle_selector("user", cached_user, filled_user or None, login_url)
 
-                # 检查是否已到达登录页
-                if any(ind.lower() in html_lower for ind in login_indicators):
-                    login_page_reached = True
+        # === Step 2: 填写密码 ===
+        password_selectors, cached_pw = cached_order("password", provider["password_selectors"], login_url)
+        filled_pw = False
+        for selector in password_selectors:
+            try:
+                password_input = field_locator(page, selector)
+                if await password_input.count() > 0 and await password_input.first.is_visible():
+                    await password_input.first.fill(PWD)
+                    log(f"🔒 填入密码 (Selector: {selector})")
+                    filled_pw = selector
                     break
+            except Exception:
+                continue
+        settle_selector("password", cached_pw, filled_pw or None, login_url)
+        lap("fill")
 
-                # 检测 CF 验证挑战的迹象
-                cf_flag = False
-                try:
-                    if "cloudflare" in html_lower or "正在验证" in html_lower or "checking your browser" in html_lower:
-                        cf_flag = True
-                    # 检查是否有 Turnstile 或 Managed Challenge 的 iframe
-                    if page.query_selector("iframe[src*='turnstile']") or page.query_selector("iframe[src*='cloudflare']") or page.query_selector("iframe[title*='challenge']"):
-                        cf_flag = True
-                except Exception:
-                    pass
+        if not (filled_user and filled_pw and USER and PWD):
+            # 如果没有填写成功，但已经到达了登录页面，仍然视为保活成功（目标是访问该页面）
+            if login_page_reached:
+                log(f"✅ 保活目标达成：到达登录页面。账号 {USER} 视为保活成功 (跳过登录)")
+                outcome = "success"
+                return "login-page"
+            else:
+                raise LoginError("unknown_state", "Failed to locate or fill login fields.")
+
+        await async_pause(TIMING["pre_submit_pause"]) # 增加延迟
+        lap("pause")
+
+        # === Step 3: 提交登录表单 ===
+        # 优先尝试缓存的提交方式，其次文本为“登录”等的按钮，再次 CSS Selector
+        submit_candidates, cached_submit = cached_order("submit", provider["submit_candidates"], login_url)
+        submitted = False
+        for candidate in submit_candidates:
+            if await async_click_submit_candidate(page, candidate):
+                submitted = candidate
+                break
+        settle_selector("submit", cached_submit, submitted or None, login_url)
+
+        if not submitted:
+            # 最后的尝试：通过回车键提交（依赖于密码框的焦点）
+            try:
+                await page.press("input[type='password']", "Enter")
+                log("🔘 使用回车键提交")
+                submitted = True
+            except:
+                log("⚠️ 未能找到任何提交方式，登录可能未触发")
+        lap("submit")
+
+        # === Step 4: 等待登录后页面或确认 ===
+        try:
+            # 增加等待时间，等待 Dashboard 加载
+            await page.wait_for_load_state("networkidle", timeout=60000) 
+        except:
+            log("⚠️ 登录提交后 networkidle 超时，继续轮询检测页面内容")
+        lap("post_networkidle")
+
+        await async_pause(TIMING["post_submit_pause"])
+
+        # === Step 5: 成功判定（页面内一次匹配，只回传命中的标识） ===
+        tokens = await async_page_signs(page, provider)
+        current_url = page.url or ""
+
+        if is_logged_in(tokens, current_url, provider):
+            log(f"✅ 账号 {USER} 登录或保活成功（检测到成功标识或 URL 跳转）")
+            await async_save_session(context, USER)
+            
+            # 提取倒计时，供守护进程模式换算截止时间
+            await async_extract_countdown(page, USER, info, provider)
+
+            lap("verify")
+            outcome = "success"
+            return "form" # 成功返回
+
+        # === Step 6: 失败判定（例如 密码错误） ===
+        lap("verify")
+        if has_sign(tokens, "credential", provider):
+            log(f"❌ 登录失败：检测到账号或密码错误的提示。")
+            raise LoginError("invalid_credentials", "Login failed: Invalid credentials detected.")
+        if has_sign(tokens, "error", provider):
+            log(f"❌ 登录失败：检测到站点错误提示，将进入重试/诊断")
+            raise LoginError("login_error", "Login failed: error message detected.")
+
+        log("⚠️ 未能确认登录后状态（既没有成功标志也没有失败提示），将进入重试/诊断")
+        raise LoginError("unknown_state", "login-unknown-state")
+
+    except Exception as e:
+        outcome = classify_error(e)
+        log(f"❌ 账号 {USER} 尝试 ({attempt}) 异常 [{OUTCOMES[outcome]['label']}]: {e}")
+        error_text = str(e)
+        lap("error") # 从最后一个完成的阶段到异常发生所经过的时间
+        # 录制了 trace 的尝试保存 trace（已包含每一步的截图和 DOM 快照）；
+        # 否则截图和 HTML 在页面线程上截取，压缩、去重、写盘交给后台线程
+        trace_saved = False
+        if tracing:
+            trace_saved = await async_save_failure_trace(context, USER, attempt)
+            tracing = False
+        if page and not trace_saved:
+            await async_capture_artifacts(page, USER)
+        lap("artifacts")
+        record_attempt(USER, attempt, spans, outcome, error_text, info)
+        spans = None
+
+        if attempt > max_retries:
+            log(f"❌ 账号 {USER} 登录最终失败（{max_retries + 1} 次尝试均未成功）")
+        elif not OUTCOMES[outcome]["retry"]:
+            log(f"❌ 账号 {USER} 登录失败（{OUTCOMES[outcome]['label']}），该类失败不再重试")
+        raise
+
+    finally:
+        try:
+            if context:
+                if tracing:
+                    await context.tracing.stop()  # 成功的尝试：不传 path，trace 直接丢弃
+                await context.close()
+        except Exception as e:
+            log(f"⚠️ 关闭浏览器上下文时出错: {e}")
+        if spans is not None:
+            record_attempt(USER, attempt, spans, outcome, error_text, info)
+        if info is not None:
+            info["outcome"] = outcome
+        # 只有连接层失败计入熔断；超时说明不了站点是否可达，不计数也不复位
+        circuit_record(host, None if outcome == "timeout" else outcome != "site_unreachable")
+
+
+# --- 5. 运行引擎 (asyncio 并发，KEEPALIVE_CONCURRENCY=1 时即顺序执行) ---
+
+def retry_delay(attempt: int) -> float:
+    """第 attempt 次尝试失败后到下一次尝试的间隔（秒），按时间配置档递增"""
+    return TIMING["retry_base"] + attempt * TIMING["retry_step"]
+
+
+async def run_accounts_async(accounts: list, concurrency: int, stats: dict, max_retries: int = 2, on_result=None,
+                             limits: dict | None = None) -> list:
+    """
+    在同一个 Chromium 中处理所有账号，并发数由 asyncio.Semaphore 限制；并发数为 1 时
+    账号逐个执行，每次尝试之后按时间配置档间隔 inter_account_delay 再放行下一次尝试。
+    limits 为 {站点名: 并发上限} 时每个站点各用一个信号量，各站点同时处理、互不等待；
+    不提供时所有账号共用 concurrency。
+    失败的尝试不原地等待：重试前的等待在信号量之外进行，空出的名额先让给排队中的新账号。
+    返回与 accounts 顺序一致的 [(user, error 或 None, info), ...]，info["path"] 为成功时采用的登录路径；
+    on_result(user, error, info) 在每个账号完成时立即调用（用于实时进度）。
+    """
+    import asyncio
+    from playwright.async_api import async_playwright
 
-                if cf_flag and not saw_cf:
-                    saw_cf = True
-                    log(f"⚠️ 检测到 Cloudflare 验证页面，等待其自动通过（最多等待 {max_wait}s）...")
-                
-                # --- 关键修改 4：更具鲁棒性的 Turnstile 点击尝试 ---
-                if saw_cf:
+    def lane_key(user: str):
+        return provider_for(user)["name"] if limits else None
+
+    # 每条通道：信号量 + 顺序执行时的尝试间隔 + 未完成账号数
+    lanes = {}
+    for user, _ in accounts:
+        key = lane_key(user)
+        if key not in lanes:
+            limit = max(limits.get(key, concurrency) if limits else concurrency, 1)
+            lanes[key] = {"semaphore": asyncio.Semaphore(limit),
+                          "gap": TIMING["inter_account_delay"] if limit == 1 else 0, "unfinished": 0}
+        lanes[key]["unfinished"] += 1
+
+    async with async_playwright() as p:
+        browser = await async_launch_browser(p, stats)
+        browser_lock = asyncio.Lock()
+
+        async def worker(user: str, pwd: str):
+            nonlocal browser
+            lane = lanes[lane_key(user)]
+            info = new_account_info()
+            # 尝试次数默认 max_retries=2 (总共 3 次)，账号文件可按账号覆盖
+            limit = account_option(user, "retries", max_retries)
+            attempt = 0
+            result = None
+            while result is None:
+                attempt += 1
+                async with lane["semaphore"]:
+                    # 共享浏览器意外断开时重新启动一次
+                    async with browser_lock:
+                        if not browser.is_connected():
+                            log("⚠️ 共享浏览器已断开，正在重新启动 Chromium")
+                            browser = await async_launch_browser(p, stats)
                     try:
-                        turnstile_iframe_handle = page.query_selector("iframe[src*='turnstile']")
-                        if turnstile_iframe_handle:
-                            log("ℹ️ 检测到 Turnstile iframe，正在切换并尝试点击... (1/3)")
-                            turnstile_frame = turnstile_iframe_handle.content_frame()
-                            if turnstile_frame:
-                                # 尝试点击 iframe 内部的可见元素，而不是隐藏的 input[type=checkbox]
-                                # 常见的 Turnstile 按钮/容器选择器
-                                # Playwright 的 locator 是最推荐的方式
-                                
-                                # 尝试使用 get_by_role('checkbox') 查找，并用 force=True 强制点击
-                                checkbox_locator = turnstile_frame.locator("body *").filter(has_text=re.compile("Verify you are human", re.IGNORECASE))
-                                if checkbox_locator.count() > 0:
-                                    # 优先点击包含 'Verify you are human' 文本的元素
-                                    checkbox_locator.first.click(timeout=5000, force=True)
-                                    log("✅ 已尝试点击 Turnstile 验证文本 (2/3)")
-                                else:
-                                    # 如果没有找到文本，尝试点击 iframe 内部的复选框
-                                    turnstile_frame.locator("input[type=checkbox]").click(timeout=5000, force=True)
-                                    log("✅ 已尝试点击 Turnstile 复选框 (2/3)")
-                                    
-                                # 增加一个短暂的等待，给 CF 留出处理点击的时间
-                                time.sleep(1.5)
-                                log("ℹ️ 点击操作已完成 (3/3)")
-                            else:
-                                log("⚠️ 找到了 iframe 但无法获取其 content_frame")
+                        info["path"] = await async_login_attempt(browser, user, pwd, attempt, limit, stats=stats, info=info)
+                        result = (user, None, info)
                     except Exception as e:
-                        log(f"ℹ️ 自动点击 Turnstile 失败 (可能元素未出现或被遮挡): {e}")
-                # --- 修改完毕 ---
-
-                time.sleep(3) # 轮询间隔
-
-            # CF/登录页状态判定
-            if saw_cf and login_page_reached:
-                log("✅ Cloudflare 验证已通过，页面已到达登录页")
-            elif saw_cf and not login_page_reached:
-                log(f"❌ 等待 Cloudflare 验证超时（{max_wait}s），未到达登录页")
-                raise RuntimeError("cf-timeout")
-            elif login_page_reached:
-                log("ℹ️ 直接到达登录页（未检测到明显 Cloudflare 验证）")
-            else:
-                log("⚠️ 未检测到登录页或 Cloudflare 验证标志，页面可能异常")
-                raise RuntimeError("no-login-or-cf")
-
-            # === Step 1: 尝试填写用户名/邮箱 ===
-            input_selectors = [
-                "input[placeholder*='邮箱']", "input[placeholder*='输入邮箱']",
-                "#inputEmail", "#inputUsername", "#username", "input[name='username']",
-                "input[name='email']", "input[type='email']"
-            ]
-            filled_user = False
-            for selector in input_selectors:
-                try:
-                    # 使用 get_by_role("textbox") 作为更健壮的定位方式
-                    email_input = page.locator(selector).or_(page.get_by_role("textbox", name=re.compile("email|邮箱", re.IGNORECASE)))
-                    if email_input.count() > 0 and email_input.first.is_visible():
-                        email_input.first.fill(USER)
-                        log(f"📝 填入用户名/邮箱 (Selector: {selector} 或 Role)")
-                        filled_user = True
-                        break
-                except Exception:
-                    continue
+                        if not should_retry(e, attempt, limit):
+                            result = (user, e, info)
+                    # 顺序执行时在让出名额前间隔一段时间；本通道最后一个账号的最后一次尝试之后不再等待
+                    if lane["gap"] and (result is None or lane["unfinished"] > 1):
+                        await async_pause(lane["gap"])
+                if result is None:
+                    wait_sec = retry_delay(attempt)
+                    log(f"⏳ 账号 {user} 将在 {wait_sec}s 后重试，期间先处理其他账号")
+                    await async_pause(wait_sec)
+            lane["unfinished"] -= 1
+            if on_result:
+                on_result(*result)
+            return result
 
-            # === Step 2: 填写密码 ===
-            password_selectors = ["input[placeholder*='密码']", "#inputPassword", "input[name='password']", "input[type='password']", "#password"]
-            filled_pw = False
-            for selector in password_selectors:
-                try:
-                    password_input = page.locator(selector).or_(page.get_by_role("textbox", name=re.compile("password|密码", re.IGNORECASE)))
-                    if password_input.count() > 0 and password_input.first.is_visible():
-                        password_input.first.fill(PWD)
-                        log(f"🔒 填入密码 (Selector: {selector} 或 Role)")
-                        filled_pw = True
-                        break
-                except Exception:
-                    continue
+        # gather 按传入顺序返回结果，报告中的账号顺序与 SITE_ACCOUNTS 保持一致
+        results = await asyncio.gather(*(worker(user, pwd) for user, pwd in accounts))
 
-            if not (filled_user and filled_pw and USER and PWD):
-                # 如果没有填写成功，但已经到达了登录页面，仍然视为保活成功（目标是访问该页面）
-                if login_page_reached:
-                    log(f"✅ 保活目标达成：到达登录页面。账号 {USER} 视为保活成功 (跳过登录)")
-                    if context: context.close()
-                    if browser: browser.close()
-                    return
+        try:
+            await browser.close()
+        except Exception as e:
+            log(f"⚠️ 关闭浏览器实例时出错: {e}")
+
+    return list(results)
+
+
+# --- 6. 多进程分片引擎 (超大账号列表) ---
+
+def split_into_shards(accounts: list, workers: int) -> list:
+    """
+    按下标轮询把账号分成 workers 个分片：分片 i = accounts[i::workers]。
+    每个条目携带原始下标 (index, user, pwd)，分片划分与执行顺序完全确定。
+    """
+    workers = max(1, min(workers, len(accounts)))
+    indexed = [(i, user, pwd) for i, (user, pwd) in enumerate(accounts)]
+    return [indexed[i::workers] for i in range(workers)]
+
+
+def run_shard(shard_id: int, shard: list, max_retries: int = 2, progress_queue=None, account_options: dict | None = None,
+              probes: dict | None = None, timing: dict | None = None) -> tuple:
+    """
+    工作进程入口：独占一个 Playwright 实例，用 run_accounts_async（并发数 1）顺序处理本分片。
+    异常对象不一定可 pickle，因此仅以字符串形式回传给父进程。
+    progress_queue 不为空时，每个账号完成后立即放入 (user, error 字符串或 None, info)。
+    account_options 为本分片账号在账号文件中的覆盖项，probes 为父进程本轮的预检结果，
+    timing 为父进程当前生效的时间配置（spawn 启动的进程不会继承父进程的全局变量）。
+    """
+    log(f"ℹ️ [分片 {shard_id}] 进程 {os.getpid()} 开始处理 {len(shard)} 个账号")
+    if timing:
+        TIMING.clear()
+        TIMING.update(timing)
+    ACCOUNT_OPTIONS.update(account_options or {})
+    PROBES.clear()
+    PROBES.update(probes or {})
+    stats = {"launches": 0, "contexts": 0}
+    # 同一个工作进程可能先后执行多个分片，只统计本分片产生的等待时长
+    sleep_before = SLEEP_STATS["seconds"]
+    on_result = None
+    if progress_queue is not None:
+        def on_result(user, error, info):
+            progress_queue.put((user, None if error is None else str(error), info))
+    try:
+        import asyncio
+
+        results = asyncio.run(run_accounts_async([(user, pwd) for _, user, pwd in shard], 1, stats, max_retries=max_retries, on_result=on_result))
+    except Exception as e:
+        # 整个分片崩溃（如 Chromium 无法启动）时，本分片的账号全部记为失败，不影响其他分片
+        log(f"❌ [分片 {shard_id}] Playwright 运行时发生严重错误: {e}")
+        results = [(user, e, new_account_info()) for _, user, _ in shard]
+        if on_result:
+            for result in results:
+                on_result(*result)
+    stats["sleep_seconds"] = SLEEP_STATS["seconds"] - sleep_before
+    flush_artifacts()
+    merged = [(index, user, None if error is None else str(error), info) for (index, _, _), (user, error, info) in zip(shard, results)]
+    return merged, stats
+
+
+def run_accounts_sharded(accounts: list, workers: int, stats: dict, max_retries: int = 2, on_result=None) -> list:
+    """
+    把账号分片到多个工作进程并行处理，合并后按原始顺序返回 [(user, error 或 None, info), ...]。
+    提供 on_result 时，各工作进程通过 Manager 队列逐个回报完成的账号，由父进程的一个线程转发。
+    工作进程固定以 spawn 方式启动：父进程此时可能有 Telegram 发送线程正持有 stdout 等锁，
+    fork 出的子进程会继承被锁住的状态而卡死；工作进程所需的状态全部通过 run_shard 的参数传入。
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    mp_context = multiprocessing.get_context("spawn")
+    shards = split_into_shards(accounts, workers)
+    merged = []
+    manager = progress_queue = relay = None
+    if on_result:
+        manager = mp_context.Manager()
+        progress_queue = manager.Queue()
+
+        def relay_progress():
+            # None 为结束标记
+            for user, error, info in iter(progress_queue.get, None):
+                on_result(user, None if error is None else RuntimeError(error), info)
+
+        relay = threading.Thread(target=relay_progress, daemon=True)
+        relay.start()
+
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=mp_context) as executor:
+        # 按分片编号顺序提交，map 也按提交顺序返回结果
+        shard_options = [{user: ACCOUNT_OPTIONS[user] for _, user, _ in shard if user in ACCOUNT_OPTIONS} for shard in shards]
+        for shard_results, shard_stats in executor.map(run_shard, range(len(shards)), shards, [max_retries] * len(shards),
+                                                       [progress_queue] * len(shards), shard_options, [dict(PROBES)] * len(shards),
+                                                       [dict(TIMING)] * len(shards)):
+            merged.extend(shard_results)
+            for key, value in shard_stats.items():
+                if isinstance(value, list):
+                    stats.setdefault(key, []).extend(value)
                 else:
-                    raise RuntimeError("Failed to locate or fill login fields.")
+                    stats[key] = stats.get(key, 0) + value
 
-            time.sleep(1 + slow_mo_ms / 1000) # 增加延迟
+    if manager is not None:
+        progress_queue.put(None)
+        relay.join()
+        manager.shutdown()
 
-            # === Step 3: 提交登录表单 ===
-            submitted = False
-            # 优先尝试点击文本为“登录”的按钮
-            button_labels = ["登录", "Login", "Sign in", "Sign In", "Submit"]
-            for label in button_labels:
-                try:
-                    # 使用更具弹性的正则表达式匹配
-                    page.get_by_role("button", name=re.compile(label, re.IGNORECASE)).click(timeout=5000)
-                    log(f"🔘 点击按钮 '{label}' 尝试登录")
-                    submitted = True
-                    break
-                except Exception:
-                    continue
+    merged.sort(key=lambda item: item[0])
+    return [(user, None if error is None else RuntimeError(error), info) for _, user, error, info in merged]
 
-            # 其次尝试通过 CSS Selector 提交
-            if not submitted:
-                try:
-                    css_candidates = ["button[type='submit']", "input[type='submit']", ".btn-primary", "form button", "form input[type='submit']"]
-                    for sel in css_candidates:
-                        try:
-                            loc = page.locator(sel)
-                            if loc.count() and loc.first.is_visible():
-                                loc.first.click(timeout=4000)
-                                log(f"🔘 点击 CSS 按钮: {sel}")
-                                submitted = True
-                                break
-                        except:
-                            continue
-                except:
-                    pass
 
-            if not submitted:
-                # 最后的尝试：通过回车键提交（依赖于密码框的焦点）
-                try:
-                    page.press("input[type='password']", "Enter")
-                    log("🔘 使用回车键提交")
-                    submitted = True
-                except:
-                    log("⚠️ 未能找到任何提交方式，登录可能未触发")
+# --- 7. 免浏览器 HTTP 快速校验 ---
+
+# 成功时采用的路径，写入 Telegram 报告
+PATH_LABELS = {
+    "http": "HTTP 校验",
+    "session": "会话恢复",
+    "form": "表单登录",
+    "login-page": "到达登录页",
+    "skipped": "跳过",
+}
 
-            # === Step 4: 等待登录后页面或确认 ===
-            try:
-                # 增加等待时间，等待 Dashboard 加载
-                page.wait_for_load_state("networkidle", timeout=60000) 
-            except:
-                log("⚠️ 登录提交后 networkidle 超时，继续轮询检测页面内容")
 
-            time.sleep(2 + slow_mo_ms / 1000)
+def verify_session_http(USER: str, info: dict | None = None) -> bool:
+    """
+    在启动浏览器之前，用 requests.Session 携带保存的 Cookie GET 客户区，
+    并套用 Step 5 的成功标识和 URL 判定。成功时把服务端刷新的 Cookie 写回 storage_state，
+    并把页面中的倒计时写入 info["countdown"]。
+    """
+    state_path = storage_state_path(USER)
+    if not os.path.exists(state_path):
+        return False
+
+    import requests
+
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        cookies = state.get("cookies", [])
+        if not cookies:
+            return False
+
+        with requests.Session() as session:
+            session.headers["User-Agent"] = CONTEXT_OPTIONS["user_agent"]
+            session.headers["Accept-Language"] = "zh-CN,zh;q=0.9,en;q=0.8"
+            for c in cookies:
+                session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+
+            response = session.get(client_area_url_for(USER), timeout=20, allow_redirects=True)
+            current_url = response.url or ""
+            provider = provider_for(USER)
+            if response.status_code != 200 or provider["login_url_marker"] in current_url:
+                return False
+            if not session_valid(match_signs(response.text.lower(), provider), current_url, provider):
+                return False
+            countdown = find_countdown(response.text, provider)
+            if countdown and info is not None:
+                info["countdown"] = countdown
+
+            # 写回服务端轮换过的 Cookie 值，保持会话新鲜
+            refreshed = {(c.name, c.domain, c.path): c.value for c in session.cookies}
+            for c in cookies:
+                key = (c["name"], c.get("domain", ""), c.get("path", "/"))
+                if key in refreshed:
+                    c["value"] = refreshed[key]
+            with open(state_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+        return True
+    except Exception as e:
+        log(f"⚠️ 账号 {USER} HTTP 快速校验异常: {e}")
+        return False
+
+
+def run_http_fast_path(indexed_accounts: list) -> tuple:
+    """
+    对 [(下标, user, pwd), ...] 中有保存会话的账号做 HTTP 校验。
+    返回 (通过校验的 {下标: (user, None, info)}, 仍需浏览器处理的 [(下标, user, pwd), ...])。
+    """
+    passed = {}
+    pending = []
+    for index, user, pwd in indexed_accounts:
+        info = new_account_info()
+        if verify_session_http(user, info):
+            log(f"✅ 账号 {user} 通过 HTTP 快速校验（无需启动浏览器）")
+            info["path"] = "http"
+            info["outcome"] = "success"
+            passed[index] = (user, None, info)
+        else:
+            pending.append((index, user, pwd))
+    return passed, pending
+
+
+def probe_site(origin: str) -> dict:
+    """
+    预检站点：失败时间隔 PROBE_RETRY_DELAY 秒重试，PROBE_ATTEMPTS 次都失败才返回 ok 为 False。
+    返回最后一次 probe_site_once 的结果，attempts 为实际尝试次数。
+    """
+    for attempt in range(1, PROBE_ATTEMPTS + 1):
+        result = probe_site_once(origin)
+        result["attempts"] = attempt
+        if result["ok"] or attempt == PROBE_ATTEMPTS:
+            return result
+        log(f"⚠️ 预检 {origin} 第 {attempt} 次失败: {result['error']}，{PROBE_RETRY_DELAY}s 后重试")
+        time.sleep(PROBE_RETRY_DELAY)
+
+
+def probe_site_once(origin: str) -> dict:
+    """
+    对站点根路径发一次 HEAD 请求，分别记录 DNS 解析、TCP 连接、TLS 握手和首字节耗时（秒）。
+    返回 {"origin", "ok", "status", "error", "dns", "connect", "tls", "ttfb", "total"}；
+    ok 为 False 表示站点明显不可用：解析 / 连接 / 握手失败、没有响应，或代理报告源站不可用。
+    任何其他 HTTP 响应（包括 403 / 405 / Cloudflare 验证页）都说明站点可达。
+    """
+    import socket
+    import ssl
 
-            # === Step 5: 成功判定 ===
-            html = ""
+    parts = urlsplit(origin)
+    host = parts.hostname or ""
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    result = {"origin": origin, "ok": False, "status": None, "error": None,
+              "dns": None, "connect": None, "tls": None, "ttfb": None, "total": None}
+    spans = {}
+    lap = phase_clock(spans)
+    sock = None
+    try:
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        lap("dns")
+        # 与 socket.create_connection 相同：依次尝试每个解析结果，全部失败时抛出最后一个错误
+        last_error = None
+        for family, socktype, proto, _, address in addresses:
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(PROBE_TIMEOUT)
             try:
-                html = page.content().lower()
-            except:
-                html = ""
+                sock.connect(address)
+                break
+            except OSError as e:
+                sock.close()
+                sock = None
+                last_error = e
+        if sock is None:
+            raise last_error
+        lap("connect")
+        if https:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+            lap("tls")
+        request = (f"HEAD / HTTP/1.1\r\nHost: {parts.netloc}\r\nUser-Agent: {CONTEXT_OPTIONS['user_agent']}\r\n"
+                   "Accept: */*\r\nConnection: close\r\n\r\n")
+        sock.sendall(request.encode("latin-1"))
+        head = sock.recv(1024)
+        lap("ttfb")
+        if not head:
+            raise ConnectionError("连接已关闭，未收到响应")
+        match = re.match(rb"HTTP/[\d.]+\s+(\d{3})", head)
+        result["status"] = int(match.group(1)) if match else None
+        if result["status"] in PROBE_DOWN_STATUSES:
+            result["error"] = f"HTTP {result['status']}"
+        else:
+            result["ok"] = True
+    except OSError as e:
+        # socket.gaierror、超时、连接被拒、SSL 错误均为 OSError 的子类
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if sock is not None:
+            sock.close()
+    result.update(spans)
+    result["total"] = round(sum(spans.values()), 3)
+    return result
 
-            success_signs = ["dashboard", "client area", "my services", "time until suspension", "security settings", "用户中心", "控制台", "注销", "logout"]
-            current_url = page.url or ""
-            
-            if any(s in html for s in success_signs) or any(x in current_url for x in ["/dashboard", "/clientarea", "/user", "/account", "/home"]):
-                log(f"✅ 账号 {USER} 登录或保活成功（检测到成功标识或 URL 跳转）")
-                
-                # 尝试提取倒计时 (保持原有逻辑)
+
+def format_probe(probe: dict) -> str:
+    """预检耗时的单行描述，未完成的阶段不显示"""
+    labels = [("dns", "DNS"), ("connect", "连接"), ("tls", "TLS"), ("ttfb", "首字节")]
+    parts = [f"{label} {probe[key]:.3f}s" for key, label in labels if probe[key] is not None]
+    if probe["status"] is not None:
+        parts.append(f"HTTP {probe['status']}")
+    return ", ".join(parts) or "无"
+
+
+def run_preflight(indexed_accounts: list) -> tuple:
+    """
+    对待浏览器处理账号的登录页站点各做一次预检，结果写入 PROBES（goto_timeout_for 据此设定导航超时）。
+    返回 (站点不可用的账号 {下标: (user, error, info)}, 不可用的预检结果列表, 仍需浏览器处理的 [(下标, user, pwd), ...])。
+    """
+    PROBES.clear()
+    for _, user, _ in indexed_accounts:
+        origin = site_origin(login_url_for(user))
+        if origin in PROBES:
+            continue
+        probe = PROBES[origin] = probe_site(origin)
+        if probe["ok"]:
+            log(f"ℹ️ 预检 {origin}: {format_probe(probe)}，导航超时 {probe_goto_timeout(probe)}s")
+        else:
+            log(f"🛑 预检 {origin} 失败: {probe['error']} ({format_probe(probe)})")
+
+    down = {}
+    pending = []
+    for index, user, pwd in indexed_accounts:
+        probe = PROBES[site_origin(login_url_for(user))]
+        if probe["ok"]:
+            pending.append((index, user, pwd))
+            continue
+        info = new_account_info()
+        info["path"] = "site-down"
+        info["site"] = probe["origin"]
+        info["outcome"] = "site_unreachable"
+        down[index] = (user, LoginError("site_unreachable", f"site-down: {probe['origin']} ({probe['error']})"), info)
+    return down, [probe for probe in PROBES.values() if not probe["ok"]], pending
+
+
+# --- 8. 主执行函数 ---
+def parse_args(argv: list | None = None):
+    """解析命令行参数（均为可选，未指定时使用对应的环境变量）"""
+    parser = argparse.ArgumentParser(description="FreeCloud 多账号登录保活脚本")
+    parser.add_argument("--timing", choices=sorted(TIMING_PROFILES), default=None,
+                        help="时间配置档，覆盖环境变量 KEEPALIVE_TIMING (默认 default)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="常驻运行，按各账号的暂停倒计时自动排期（等同 KEEPALIVE_MODE=daemon）")
+    parser.add_argument("--accounts-file", default=None,
+                        help="账号文件 (.json / .jsonl / .toml / .yaml)，覆盖环境变量 KEEPALIVE_ACCOUNTS_FILE，设置后忽略 SITE_ACCOUNTS")
+    return parser.parse_args(argv)
+
+
+def parse_account_format(site_accounts: str, entry_separator: str, pair_separator: str) -> list | None:
+    """
+    按一种写法严格解析 SITE_ACCOUNTS：每个条目在第一个 pair_separator 处分成用户名和密码。
+    任一条目缺少分隔符、用户名或密码为空、用户名中含有 `,` `;` `:` 时返回 None（该写法不成立）。
+    """
+    accounts = []
+    for entry in site_accounts.split(entry_separator):
+        if not entry.strip():
+            continue
+        user, separator, pwd = entry.partition(pair_separator)
+        user, pwd = user.strip(), pwd.strip()
+        if not separator or not user or not pwd or any(c in user for c in ",;:"):
+            return None
+        accounts.append((user, pwd))
+    return accounts
+
+
+def parse_accounts(site_accounts: str) -> list:
+    """
+    把 SITE_ACCOUNTS 解析成 [(user, pwd), ...]。支持两种写法：
+    - README 中的 `user1,password1;user2,password2`（密码中不能含 `;`）
+    - 旧写法 `user1:password1,user2:password2`（密码中不能含 `,`）
+    用户名不含分隔符，因此两种写法不会同时成立；都不成立时抛出 ValueError，不猜测。
+    """
+    readme = parse_account_format(site_accounts, ";", ",")
+    legacy = parse_account_format(site_accounts, ",", ":")
+    if readme is None and legacy is None:
+        raise ValueError("既不是 `user,password;...` 也不是 `user:password,...` 写法；"
+                         "密码中含有分隔符时请改用账号文件 (KEEPALIVE_ACCOUNTS_FILE)")
+    if readme is not None and legacy is not None and readme != legacy:
+        raise ValueError("无法确定 SITE_ACCOUNTS 的写法，请改用账号文件 (KEEPALIVE_ACCOUNTS_FILE)")
+    return readme if readme is not None else legacy
+
+
+# 账号文件中每个条目允许的字段及类型；user / password 必填，其余为按账号覆盖项
+ACCOUNT_FIELDS = {
+    "user": str,
+    "password": str,
+    "target_url": str,
+    "client_area_url": str,
+    "retries": int,
+    "goto_timeout": (int, float),
+    "login_wait": (int, float),
+    "priority": int,
+    "provider": str,
+}
+# 一次校验中最多列出的错误条数
+MAX_REPORTED_ERRORS = 20
+
+
+def iter_account_entries(path: str):
+    """
+    按文件扩展名逐个产出 (位置, 条目)。JSONL 逐行流式读取；JSON / TOML / YAML 为单个文档，
+    顶层可以是条目列表，或包含 accounts 列表的对象。无法解析的行以 (位置, ValueError) 产出。
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
                 try:
-                    countdown_loc = page.get_by_text("Time until suspension", exact=False, timeout=10000)
-                    if countdown_loc.is_visible():
-                        countdown_text = countdown_loc.text_content()
-                        m = re.search(r"(\d+d\s+\d+h\s+\d+m\s+\d+s)", countdown_text)
-                        if m:
-                            log(f"⏱️ 登录后检测到倒计时: {m.group(1)}")
-                        else:
-                            # 尝试在父元素中查找
-                            parent_text = countdown_loc.evaluate("e => e.parentElement.textContent")
-                            m = re.search(r"(\d+d\s+\d+h\s+\d+m\s+\d+s)", parent_text)
-                            if m:
-                                log(f"⏱️ 登录后检测到倒计时: {m.group(1)}")
-                            else:
-                                log(f"ℹ️ 找到 'Time until suspension' 但未提取到具体时间: {parent_text[:100].strip()}")
-                except Exception:
-                    pass 
-
-                if context: context.close()
-                if browser: browser.close()
-                return # 成功返回
-
-            # === Step 6: 失败判定（例如 密码错误） ===
-            failure_signs = ["wrong password", "密码错误", "invalid login", "登录失败", "邮箱或密码不正确", "not a member yet?"]
-            if any(s in html for s in failure_signs):
-                log(f"❌ 登录失败：检测到错误提示（可能是密码错误或账号问题）。")
-                if context: context.close()
-                if browser: browser.close()
-                raise RuntimeError("Login failed: Invalid credentials or error message detected.") 
-
-            log("⚠️ 未能确认登录后状态（既没有成功标志也没有失败提示），将进入重试/诊断")
-            raise RuntimeError("login-unknown-state")
+                    yield f"{path}:{lineno}", json.loads(line)
+                except ValueError as e:
+                    yield f"{path}:{lineno}", ValueError(f"JSON 解析失败: {e}")
+        return
 
-        except Exception as e:
-            log(f"❌ 账号 {USER} 尝试 ({attempt}) 异常: {e}")
-            # --- 保持调试文件保存逻辑 ---
+    if ext == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    elif ext == ".toml":
+        try:
+            import tomllib
+        except ImportError:
             try:
-                timestamp = datetime.now().strftime("%Y%m%dT%H%M%SZ")
-                if page:
-                    try:
-                        screenshot_path = f"screenshot_{USER.replace('@','_')}_{timestamp}.png"
-                        page.screenshot(path=screenshot_path, full_page=True)
-                        log(f"📷 已保存截图: {screenshot_path}")
-                    except Exception as ex_s:
-                        log(f"⚠️ 保存截图失败: {ex_s}")
-                    try:
-                        html_path = f"page_{USER.replace('@','_')}_{timestamp}.html"
-                        content = page.content()
-                        with open(html_path, "w", encoding="utf-8") as f:
-                            f.write(content)
-                        log(f"📝 已保存页面 HTML: {html_path}")
-                    except Exception as ex_h:
-                        log(f"⚠️ 保存 HTML 失败: {ex_h}")
-            except Exception as ex_debug:
-                log(f"⚠️ 写入调试文件时发生异常: {ex_debug}")
-            # --- 调试文件保存逻辑结束 ---
-
-            if attempt <= max_retries:
-                wait_sec = 10 + attempt * 5 # 增加重试间隔
-                log(f"⏳ 等待 {wait_sec}s 后重试...")
-                time.sleep(wait_sec)
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError("读取 TOML 账号文件需要 Python 3.11+ 或安装 tomli")
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    elif ext in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("读取 YAML 账号文件需要安装 PyYAML (pip install pyyaml)")
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(f"YAML 解析失败: {e}")
+    else:
+        raise ValueError(f"不支持的账号文件格式: {ext or path}（支持 .json / .jsonl / .toml / .yaml）")
+
+    if isinstance(data, dict):
+        data = data.get("accounts")
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: 顶层应为账号列表，或包含 accounts 列表的对象")
+    for i, entry in enumerate(data, 1):
+        yield f"{path}#{i}", entry
+
+
+def validate_account_entry(entry) -> list:
+    """返回该条目的全部错误（空列表表示有效）"""
+    if not isinstance(entry, dict):
+        return [f"条目应为对象，实际为 {type(entry).__name__}"]
+    errors = []
+    for key in entry:
+        if key not in ACCOUNT_FIELDS:
+            errors.append(f"未知字段 {key!r}")
+    for key in ("user", "password"):
+        if not isinstance(entry.get(key), str) or not entry[key].strip():
+            errors.append(f"缺少 {key}")
+    for key, expected in ACCOUNT_FIELDS.items():
+        if key not in entry or key in ("user", "password"):
+            continue
+        value = entry[key]
+        # 显式的 null 不等于省略该字段，否则会原样存进覆盖项，运行到一半才出错
+        if value is None:
+            errors.append(f"{key} 不能为 null（不需要覆盖时请省略该字段）")
+        # bool 是 int 的子类，需单独排除
+        elif isinstance(value, bool) or not isinstance(value, expected):
+            errors.append(f"{key} 类型错误: {value!r}")
+        elif key in ("target_url", "client_area_url") and urlsplit(value).scheme not in ("http", "https"):
+            errors.append(f"{key} 不是 http(s) 地址: {value!r}")
+        elif key == "provider" and value not in PROVIDERS:
+            errors.append(f"未知的 provider {value!r}，可选: {', '.join(PROVIDERS)}")
+        elif key == "retries" and value < 0:
+            errors.append("retries 不能为负数")
+        elif key in ("goto_timeout", "login_wait") and value <= 0:
+            errors.append(f"{key} 必须大于 0")
+    return errors
+
+
+def load_accounts_file(path: str) -> tuple:
+    """
+    一次性读取并校验账号文件，在启动任何浏览器之前发现全部错误。
+    返回 ([(user, pwd), ...] 按 priority 从高到低稳定排序, {user: 覆盖项})；有任何错误时抛出 ValueError 并列出所有错误。
+    """
+    entries = []
+    errors = []
+    seen = set()
+    for location, entry in iter_account_entries(path):
+        problems = [str(entry)] if isinstance(entry, ValueError) else validate_account_entry(entry)
+        user = entry.get("user") if isinstance(entry, dict) else None
+        if isinstance(user, str) and user.strip():
+            if user.strip() in seen:
+                problems.append(f"账号 {user.strip()} 重复")
+            seen.add(user.strip())
+        if problems:
+            errors.extend(f"{location}: {problem}" for problem in problems)
+        else:
+            entries.append(entry)
+
+    if errors:
+        shown = errors[:MAX_REPORTED_ERRORS]
+        if len(errors) > len(shown):
+            shown.append(f"... 另有 {len(errors) - len(shown)} 个错误")
+        raise ValueError("账号文件校验失败:\n" + "\n".join(shown))
+
+    entries.sort(key=lambda entry: -entry.get("priority", 0))
+    accounts = [(entry["user"].strip(), entry["password"]) for entry in entries]
+    options = {}
+    for entry in entries:
+        overrides = {key: value for key, value in entry.items() if key not in ("user", "password")}
+        if overrides:
+            options[entry["user"].strip()] = overrides
+    return accounts, options
+
+
+def run_keepalive(accounts: list, timing_name: str, allow_skip: bool = True, progress: dict | None = None) -> tuple:
+    """
+    对一批账号执行一轮保活（截止时间筛选 + 站点预检 + HTTP 快速校验 + 浏览器引擎），记录倒计时截止时间。
+    allow_skip 为 False 时不按 KEEPALIVE_SKIP_DAYS 跳过账号（守护进程已按截止时间排期）。
+    progress 为 start_progress 返回的状态，每个账号完成时更新 Telegram 状态消息。
+    返回 (Telegram 报告文本, [(user, error, info), ...])。
+    """
+    run_started = time.monotonic()
+    sleep_started = SLEEP_STATS["seconds"]
+
+    # 执行引擎：auto (默认) 在一个进程内按 KEEPALIVE_CONCURRENCY 并发（为 1 时即顺序执行）；process 为多进程分片
+    engine = os.environ.get('KEEPALIVE_ENGINE', 'auto').strip().lower()
+    concurrency = env_int('KEEPALIVE_CONCURRENCY', 1)
+    workers = env_int('KEEPALIVE_WORKERS', os.cpu_count() or 1)
+    skip_days = env_int('KEEPALIVE_SKIP_DAYS', 0) if allow_skip else 0
+
+    # 3. 运行 Playwright 并执行登录
+    report_lines = ["*FreeCloud 自动保活报告*"]
+    success_count = 0
+    skipped_count = 0
+    # 浏览器复用统计：contexts = 实际创建的 Context 数（即旧版会启动浏览器的次数）
+    launch_stats = {"launches": 0, "contexts": 0}
+    path_counts = {}
+    total_blocked = 0
+    phase_records = []
+    results = []
+
+    try:
+        # 距暂停截止还很远的账号直接跳过；其余账号先预检站点，明显不可用的站点整站跳过（连 HTTP 快速校验也不做）；
+        # 有保存会话的账号再走 HTTP 快速校验，只有未通过的账号才进入 Playwright
+        skipped, pending = split_far_deadlines(accounts, skip_days)
+        if skipped:
+            log(f"ℹ️ {len(skipped)} 个账号剩余时间超过 {skip_days} 天，本次跳过")
+        passed = dict(skipped)
+        if pending and os.environ.get('KEEPALIVE_PREFLIGHT', '1') != '0':
+            down, down_probes, pending = run_preflight(pending)
+            for probe in down_probes:
+                affected = sum(1 for _, _, info in down.values() if info["site"] == probe["origin"])
+                report_lines.append(f"🛑 站点 `{probe['origin']}` 无法访问 ({escape_markdown(probe['error'])})，"
+                                    f"{affected} 个账号已跳过浏览器阶段")
+            passed.update(down)
+        if os.environ.get('KEEPALIVE_HTTP_CHECK', '1') != '0':
+            verified, pending = run_http_fast_path(pending)
+            log(f"ℹ️ HTTP 快速校验通过 {len(verified)} 个账号，{len(pending)} 个账号需要浏览器处理")
+            passed.update(verified)
+
+        def on_result(user, error, info):
+            update_progress(progress, user, error, info)
+
+        for index in sorted(passed):
+            on_result(*passed[index])
+
+        results_by_index = dict(passed)
+        if pending:
+            browser_accounts = [(user, pwd) for _, user, pwd in pending]
+            if engine == 'process':
+                log(f"ℹ️ 使用多进程分片引擎，工作进程数: {max(1, min(workers, len(browser_accounts)))}")
+                browser_results = run_accounts_sharded(browser_accounts, workers, launch_stats, max_retries=2,
+                                                       on_result=on_result if progress else None)
             else:
-                log(f"❌ 账号 {USER} 登录最终失败（{max_retries + 1} 次尝试均未成功）")
-                raise e
+                import asyncio
 
-        finally:
-            try:
-                if context: context.close()
-                if browser: browser.close()
-            except Exception as e:
-                log(f"⚠️ 关闭浏览器实例时出错: {e}")
+                # 各站点在同一个浏览器中同时处理，每个站点受自己的并发上限约束
+                limits = {}
+                for _, user, _ in pending:
+                    name = provider_for(user)["name"]
+                    limits.setdefault(name, provider_concurrency(name, concurrency))
+                log("ℹ️ 并发上限: " + ", ".join(f"{name} {limit}" for name, limit in limits.items()))
+                browser_results = asyncio.run(run_accounts_async(browser_accounts, concurrency, launch_stats, max_retries=2,
+                                                                 on_result=on_result, limits=limits))
+            # 按账号原始顺序合并各条路径的结果
+            for (index, _, _), result in zip(pending, browser_results):
+                results_by_index[index] = result
+        results = [results_by_index[i] for i in sorted(results_by_index)]
+        record_deadlines(results)
+        flush_artifacts()
+
+        for user, error, info in results:
+            path = info["path"]
+            phase_records.extend(info["phases"])
+            if info["requests"]:
+                log(f"ℹ️ 账号 {user} 网络流量: {format_traffic(info)}")
+            if path == "skipped":
+                report_lines.append(f"⏭️ 账号: `{user}` - 已跳过 (剩余 {info['days_left']} 天)")
+                skipped_count += 1
+            elif path == "site-down":
+                # 报告中已按站点列出一条“无法访问”，不再逐个账号重复
+                log(f"❌ 账号 {user} 保活失败 [站点无法访问]: {error}")
+            elif error is None:
+                log(f"✅ 账号 {user} 保活成功")
+                detail = PATH_LABELS.get(path, path)
+                if BLOCK_RESOURCES and info["requests"]:
+                    detail += f", {format_traffic(info)}"
+                if info["countdown"]:
+                    detail += f", 剩余 {info['countdown']}"
+                report_lines.append(f"✅ 账号: `{user}` - 成功 ({detail})")
+                success_count += 1
+                path_counts[path] = path_counts.get(path, 0) + 1
+                total_blocked += info["blocked"]
+            else:
+                label = OUTCOMES.get(info.get("outcome"), OUTCOMES["unknown_state"])["label"]
+                log(f"❌ 账号 {user} 保活失败 [{label}]: {error}")
+                total_blocked += info["blocked"]
+                # 修复 Telegram 消息格式，对特殊字符进行转义
+                report_lines.append(f"❌ 账号: `{user}` - 失败 ({label}): {escape_markdown(str(error))}")
+    except Exception as e:
+        log(f"❌ Playwright 运行时发生严重错误: {e}")
+        report_lines.append(f"❌ 严重错误: {escape_markdown(str(e))}")
 
-    log(f"❌ 账号 {USER} 所有 {max_retries + 1} 次尝试均已失败。")
-    raise RuntimeError(f"Account {USER} failed all {max_retries + 1} login attempts.")
+    # 4. 发送总结报告
+    report_lines.append(f"\n--- *总结* ---")
+    summary = f"总数: {len(accounts)}, 成功: {success_count}, 失败: {len(accounts) - success_count - skipped_count}"
+    if skipped_count:
+        summary += f", 跳过: {skipped_count}"
+    report_lines.append(summary)
+    saved_launches = max(launch_stats["contexts"] - launch_stats["launches"], 0)
+    if BLOCK_RESOURCES:
+        report_lines.append(f"请求拦截: 共中止 {total_blocked} 个图片/字体/媒体/第三方请求")
+    if path_counts:
+        report_lines.append("路径: " + ", ".join(f"{PATH_LABELS.get(k, k)} {v}" for k, v in path_counts.items()))
+    phase_records.extend({"launch": seconds} for seconds in launch_stats.get("launch_seconds", []))
+    phase_table = format_phase_table(phase_records)
+    if phase_table:
+        report_lines.append("分阶段耗时:")
+        report_lines.append(phase_table)
+    report_lines.append(f"浏览器启动: {launch_stats['launches']} 次, 上下文: {launch_stats['contexts']} 个, 节省启动: {saved_launches} 次")
+    elapsed = time.monotonic() - run_started
+    sleep_seconds = SLEEP_STATS["seconds"] - sleep_started + launch_stats.get("sleep_seconds", 0.0)
+    sleep_ratio = f" ({sleep_seconds / elapsed:.0%})" if 0 < elapsed and sleep_seconds <= elapsed else ""
+    report_lines.append(f"耗时: {elapsed:.1f}s, 固定等待: {sleep_seconds:.1f}s{sleep_ratio}, 时间配置: {timing_name}")
+    log(f"ℹ️ 总耗时 {elapsed:.1f}s，其中固定等待累计 {sleep_seconds:.1f}s（并发引擎下为各账号等待之和）")
+    log(f"ℹ️ 浏览器复用统计：启动 {launch_stats['launches']} 次，创建上下文 {launch_stats['contexts']} 个，节省 {saved_launches} 次启动")
+    return "\n".join(report_lines), results
 
 
-# --- 4. 主执行函数 ---
-def main():
+def main(argv: list | None = None):
     """主执行函数"""
+    args = parse_args(argv)
     log("🚀 开始执行保活任务...")
+    timing_name = apply_timing_profile(args.timing or os.environ.get('KEEPALIVE_TIMING', 'default'))
+    log(f"ℹ️ 时间配置档: {timing_name}")
 
     # 1. 从 GitHub Secrets (环境变量) 中读取信息
     bot_token = os.environ.get('TELEGRAM_BOT_TOKEN', 'YOUR_BOT_TOKEN_HERE') # 默认值
     chat_id = os.environ.get('TELEGRAM_CHAT_ID', 'YOUR_CHAT_ID_HERE')     # 默认值
     site_accounts = os.environ.get('SITE_ACCOUNTS', 'eraierbing1314@gmail.com:YOUR_PASSWORD_HERE') # 默认值
     telegram_proxy = os.environ.get('TELEGRAM_PROXY')
+    accounts_file = args.accounts_file or os.environ.get('KEEPALIVE_ACCOUNTS_FILE')
 
-    if bot_token == 'YOUR_BOT_TOKEN_HERE' or chat_id == 'YOUR_CHAT_ID_HERE' or site_accounts == 'eraierbing1314@gmail.com:YOUR_PASSWORD_HERE':
+    if bot_token == 'YOUR_BOT_TOKEN_HERE' or chat_id == 'YOUR_CHAT_ID_HERE' or (not accounts_file and site_accounts == 'eraierbing1314@gmail.com:YOUR_PASSWORD_HERE'):
         log("❌ 请确保已正确设置 TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID 和 SITE_ACCOUNTS 环境变量。")
         log("ℹ️ 目前正在使用默认的占位符值，这会导致任务失败。")
         return
 
-    # 2. 解析账号
-    accounts = []
-    try:
-        for acc_pair in site_accounts.split(','):
-            if ':' in acc_pair:
-                user, pwd = acc_pair.split(':', 1)
-                accounts.append((user.strip(), pwd.strip()))
-    except Exception as e:
-        log(f"❌ 解析 SITE_ACCOUNTS 失败: {e}")
+    if DEFAULT_PROVIDER not in PROVIDERS:
+        log(f"❌ KEEPALIVE_PROVIDER 未知: {DEFAULT_PROVIDER}，可选: {', '.join(PROVIDERS)}")
         return
 
+    # 2. 解析账号：账号文件优先，所有条目在启动浏览器前一次校验完毕
+    if accounts_file:
+        try:
+            accounts, options = load_accounts_file(accounts_file)
+        except (OSError, ValueError) as e:
+            log(f"❌ 读取账号文件失败: {e}")
+            return
+        ACCOUNT_OPTIONS.update(options)
+    else:
+        try:
+            accounts = parse_accounts(site_accounts)
+        except Exception as e:
+            log(f"❌ 解析 SITE_ACCOUNTS 失败: {e}")
+            return
+
     if not accounts:
         log("⚠️ 未找到任何账号信息")
         return
 
     log(f"ℹ️ 成功加载 {len(accounts)} 个账号")
-    
-    # 3. 运行 Playwright 并执行登录
-    report_lines = ["*FreeCloud 自动保活报告*"]
-    success_count = 0
-    
-    try:
-        with sync_playwright() as p:
-            for user, pwd in accounts:
-                try:
-                    # 尝试次数改为 max_retries=2 (总共 3 次)
-                    login_account(p, user, pwd, max_retries=2) 
-                    
-                    log(f"✅ 账号 {user} 保活成功")
-                    report_lines.append(f"✅ 账号: `{user}` - 成功")
-                    success_count += 1
-                except Exception as e:
-                    log(f"❌ 账号 {user} 保活失败: {e}")
-                    # 修复 Telegram 消息格式，对特殊字符进行转义
-                    error_message = str(e)
-                    # 仅转义 Markdown V2 中需要转义的字符
-                    escaped_error = error_message.replace("_", "\\_").replace("*", "\\*").replace("[", "\\[").replace("`", "\\`").replace("(", "\\(").replace(")", "\\)")
-                    report_lines.append(f"❌ 账号: `{user}` - 失败: {escaped_error}")
-                    
-                time.sleep(5)
-    except Exception as e:
-        log(f"❌ Playwright 运行时发生严重错误: {e}")
-        error_message = str(e)
-        escaped_error = error_message.replace("_", "\\_").replace("*", "\\*").replace("[", "\\[").replace("`", "\\`").replace("(", "\\)")
-        report_lines.append(f"❌ 严重错误: {escaped_error}")
 
-    # 4. 发送总结报告
-    report_lines.append(f"\n--- *总结* ---")
-    report_lines.append(f"总数: {len(accounts)}, 成功: {success_count}, 失败: {len(accounts) - success_count}")
-    
-    final_report = "\n".join(report_lines)
-    send_telegram_message(bot_token, chat_id, final_report, telegram_proxy)
+    # 3. 守护进程模式：常驻并按倒计时排期；否则执行一轮后退出
+    if args.daemon or os.environ.get('KEEPALIVE_MODE', '').strip().lower() == 'daemon':
+        try:
+            run_daemon(accounts, timing_name, bot_token, chat_id, telegram_proxy)
+        except KeyboardInterrupt:
+            log("🛑 守护进程已停止")
+        finally:
+            wait_for_telegram()
+        return
+
+    progress = start_progress(bot_token, chat_id, len(accounts), telegram_proxy) if LIVE_PROGRESS else None
+    final_report, _ = run_keepalive(accounts, timing_name, progress=progress)
+    finish_progress(progress, bot_token, chat_id, final_report, telegram_proxy)
+    wait_for_telegram()
     log("🏁 保活任务全部执行完毕")
 
-# --- 5. 脚本入口 ---
+
+# --- 9. 守护进程模式 ---
+# 睡眠按块进行，便于日志里看到心跳，也避免系统休眠后长时间错过到期点
+DAEMON_MAX_SLEEP = 3600
+
+
+def initial_due(entry: dict | None, now: float, lead: float) -> float:
+    """启动时的排期：有截止时间记录的账号在截止前 lead 秒到期，没有记录的立即执行"""
+    if not entry:
+        return now
+    return max(entry["deadline"] - lead, now)
+
+
+def next_due(entry: dict | None, ok: bool, batch_started: float, now: float,
+             lead: float, fallback: float, retry: float) -> float:
+    """
+    一轮执行后的排期：
+    - 失败：retry 秒后重试；
+    - 成功且本轮观测到了倒计时：截止前 lead 秒（至少间隔 retry 秒，防止倒计时短于 lead 时空转）；
+    - 成功但没拿到倒计时：fallback 秒后兜底再执行。
+    """
+    if not ok:
+        return now + retry
+    if entry and entry.get("observed_at", 0) >= batch_started:
+        return max(entry["deadline"] - lead, now + retry)
+    return now + fallback
+
+
+def run_daemon(accounts: list, timing_name: str, bot_token: str, chat_id: str, telegram_proxy: str | None):
+    """
+    常驻运行：用最小堆按到期时间排列账号，睡到最早的到期点，
+    把所有已到期的账号作为一批交给 run_keepalive，每批发送一份报告，然后重新排期。
+    """
+    lead = env_int('KEEPALIVE_DAEMON_LEAD_HOURS', 24) * 3600
+    fallback = env_int('KEEPALIVE_DAEMON_FALLBACK_HOURS', 24) * 3600
+    retry = env_int('KEEPALIVE_DAEMON_RETRY_MINUTES', 60) * 60
+
+    deadlines = load_deadlines()
+    now = time.time()
+    queue = [(initial_due(deadlines.get(user), now, lead), index) for index, (user, _) in enumerate(accounts)]
+    heapq.heapify(queue)
+    log(f"ℹ️ 守护进程模式启动：{len(accounts)} 个账号，截止前 {lead // 3600}h 执行，失败 {retry // 60}min 后重试")
+
+    while True:
+        wait = queue[0][0] - time.time()
+        if wait > 0:
+            log(f"💤 下一个账号将在 {datetime.fromtimestamp(queue[0][0]).strftime('%Y-%m-%d %H:%M:%S')} 到期，等待 {wait / 3600:.1f}h")
+            time.sleep(min(wait, DAEMON_MAX_SLEEP))
+            continue
+
+        batch = []
+        while queue and queue[0][0] <= time.time():
+            batch.append(heapq.heappop(queue)[1])
+        batch.sort()
+
+        batch_started = time.time()
+        log(f"🚀 守护进程：{len(batch)} 个账号到期，开始执行")
+        progress = start_progress(bot_token, chat_id, len(batch), telegram_proxy) if LIVE_PROGRESS else None
+        final_report, results = run_keepalive([accounts[i] for i in batch], timing_name, allow_skip=False, progress=progress)
+        # 后台发送，排期和下一轮等待不必等 Telegram 返回
+        finish_progress(progress, bot_token, chat_id, final_report, telegram_proxy)
+
+        # run_keepalive 整体异常时 results 为空，本批全部按失败处理
+        outcomes = [error is None for _, error, _ in results] if len(results) == len(batch) else [False] * len(batch)
+        deadlines = load_deadlines()
+        now = time.time()
+        for index, ok in zip(batch, outcomes):
+            user = accounts[index][0]
+            due = next_due(deadlines.get(user), ok, batch_started, now, lead, fallback, retry)
+            heapq.heappush(queue, (due, index))
+            log(f"📅 账号 {user} 下次执行: {datetime.fromtimestamp(due).strftime('%Y-%m-%d %H:%M:%S')}")
+
+
+# --- 10. 脚本入口 ---
 if __name__ == "__main__":
     main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# login.py 位于仓库根目录，不是可安装的包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import login
+
+
+def write_jsonl(tmp_path, *entries):
+    path = tmp_path / "accounts.jsonl"
+    path.write_text("\n".join(json.dumps(entry) for entry in entries), encoding="utf-8")
+    return str(path)
+
+
+def test_load_accounts_file_sorts_by_priority_and_keeps_overrides(tmp_path):
+    path = write_jsonl(
+        tmp_path,
+        {"user": "a@example.com", "password": "pa"},
+        {"user": " b@example.com ", "password": "pb", "priority": 5, "retries": 1},
+    )
+    accounts, options = login.load_accounts_file(path)
+    assert accounts == [("b@example.com", "pb"), ("a@example.com", "pa")]
+    assert options == {"b@example.com": {"priority": 5, "retries": 1}}
+
+
+@pytest.mark.parametrize("key", ["priority", "retries", "target_url", "goto_timeout", "provider"])
+def test_load_accounts_file_rejects_null_overrides(tmp_path, key):
+    path = write_jsonl(tmp_path, {"user": "a@example.com", "password": "pa", key: None})
+    with pytest.raises(ValueError, match=f"{key} 不能为 null"):
+        login.load_accounts_file(path)
+
+
+def test_load_accounts_file_reports_every_error(tmp_path):
+    path = write_jsonl(
+        tmp_path,
+        {"user": "a@example.com", "password": "pa", "retries": -1},
+        {"user": "a@example.com", "password": "pa"},
+        {"user": "c@example.com", "password": "pc", "target_url": "ftp://x", "colour": "red"},
+        {"password": "pd"},
+    )
+    with pytest.raises(ValueError) as excinfo:
+        login.load_accounts_file(path)
+    message = str(excinfo.value)
+    for expected in (":1: retries 不能为负数", ":2: 账号 a@example.com 重复", ":3: 未知字段 'colour'",
+                     ":3: target_url 不是 http(s) 地址", ":4: 缺少 user"):
+        assert expected in message
+
+
+def test_load_accounts_file_reports_unparsable_lines(tmp_path):
+    path = tmp_path / "accounts.jsonl"
+    path.write_text('{"user": "a@example.com", "password": "pa"}\n{not json\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=r"accounts.jsonl:2: JSON 解析失败"):
+        login.load_accounts_file(str(path))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("a@x.com,p1;b@x.com,p2", [("a@x.com", "p1"), ("b@x.com", "p2")]),
+    ("a@x.com:p1,b@x.com:p2", [("a@x.com", "p1"), ("b@x.com", "p2")]),
+    ("a@x.com,p:1;b@x.com,p,2;", [("a@x.com", "p:1"), ("b@x.com", "p,2")]),
+    ("a@x.com:p;1", [("a@x.com", "p;1")]),
+])
+def test_parse_accounts(text, expected):
+    assert login.parse_accounts(text) == expected
+
+
+@pytest.mark.parametrize("text", ["a@x.com", "a@x.com,", "a@x.com,p1;b@x.com", "a@x.com,p,1:2;b@x.com:p2"])
+def test_parse_accounts_rejects_malformed_input(text):
+    with pytest.raises(ValueError):
+        login.parse_accounts(text)
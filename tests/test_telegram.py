@@ -0,0 +1,28 @@
+import login
+
+
+def test_split_message_keeps_short_messages_whole():
+    assert login.split_message("a\nb") == ["a\nb"]
+
+
+def test_split_message_respects_limit_and_preserves_lines():
+    message = "\n".join(f"line {i}" for i in range(200))
+    chunks = login.split_message(message, limit=100)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert "\n".join(chunks).split("\n") == message.split("\n")
+
+
+def test_split_message_reopens_code_fences():
+    message = "report\n```\n" + "\n".join(f"row {i}" for i in range(100)) + "\n```\nend"
+    chunks = login.split_message(message, limit=120)
+    assert len(chunks) > 2
+    for chunk in chunks:
+        assert len(chunk) <= 120
+        assert chunk.count("```") % 2 == 0
+
+
+def test_split_message_hard_cuts_long_lines():
+    chunks = login.split_message("x" * 250, limit=100)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert "".join(chunks) == "x" * 250